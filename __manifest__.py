@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 {
     'name': 'Icecat Product Enrichment',
-    'version': '18.0.1.0.0',
+    'version': '18.0.1.1.0',
     'category': 'Sales/Product',
     'summary': 'Enrich products with Icecat data based on EAN/GTIN',
     'description': """
@@ -34,14 +34,24 @@ Batch Processing:
     ],
     'data': [
         'security/ir.model.access.csv',
+        'data/ir_config_parameter_data.xml',
         'data/ir_cron_data.xml',
         'views/res_config_settings_views.xml',
         'views/product_template_views.xml',
         'views/icecat_sync_log_views.xml',
+        'views/icecat_sync_job_views.xml',
+        'views/icecat_negative_cache_views.xml',
+        'views/icecat_spec_views.xml',
         'views/icecat_category_mapping_views.xml',
         'views/website_product_specifications.xml',
+        'views/website_shop_facets.xml',
         'wizards/icecat_sync_wizard_views.xml',
     ],
+    'assets': {
+        'web.assets_frontend': [
+            'icecat_product_enrichment/static/src/scss/icecat_specifications.scss',
+        ],
+    },
     'external_dependencies': {
         'python': ['requests'],
     },
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+
+import re
+
+from odoo import http
+from odoo.http import request
+from odoo.osv import expression
+
+from odoo.addons.website_sale.controllers.main import WebsiteSale
+
+from ..models.icecat_connector import NUMERIC_FEATURE_TYPES
+
+# Range bounds of a numerical feature: spec_min_<feature id> / spec_max_<feature id>
+SPEC_RANGE_RE = re.compile(r'^spec_(min|max)_(\d+)$')
+
+
+def _parse_spec_filters(tokens):
+    """
+    Parse the ``spec`` URL values, "<feature id>:<value>", into a dict mapping
+    the feature id to the set of selected values; malformed values are ignored
+    """
+    filters = {}
+    for token in tokens:
+        feature_id, sep, value = token.partition(':')
+        if sep and feature_id.isdigit() and value:
+            filters.setdefault(int(feature_id), set()).add(value)
+    return filters
+
+
+def _parse_spec_ranges(args):
+    """
+    Parse the range URL arguments into a dict mapping the feature id to its
+    (minimum, maximum), in the numeric unit of the feature; a bound is None
+    when absent, empty or not a number
+    """
+    ranges = {}
+    for key, value in args.items():
+        match = SPEC_RANGE_RE.match(key)
+        if not match:
+            continue
+        try:
+            bound = float(value.replace(',', '.'))
+        except ValueError:
+            continue
+        minimum, maximum = ranges.get(int(match.group(2)), (None, None))
+        if match.group(1) == 'min':
+            minimum = bound
+        else:
+            maximum = bound
+        ranges[int(match.group(2))] = (minimum, maximum)
+    return ranges
+
+
+class IcecatWebsiteSale(WebsiteSale):
+
+    def _get_spec_tokens(self):
+        return request.httprequest.args.getlist('spec')
+
+    def _get_spec_range_args(self):
+        return {
+            key: value for key, value in request.httprequest.args.items()
+            if SPEC_RANGE_RE.match(key) and value
+        }
+
+    def _get_search_options(self, *args, **kwargs):
+        # Filters the product grid, see product.template._search_get_detail; read from the
+        # query string because the keyword arguments only hold one value per key
+        options = super()._get_search_options(*args, **kwargs)
+        options['icecat_spec_filters'] = {
+            feature_id: sorted(values) for feature_id, values in _parse_spec_filters(self._get_spec_tokens()).items()
+        }
+        options['icecat_spec_ranges'] = _parse_spec_ranges(self._get_spec_range_args())
+        return options
+
+    def _get_shop_domain(self, *args, **kwargs):
+        # Only used for the price range here, which follows the spec filters like it follows the attributes
+        domain = super()._get_shop_domain(*args, **kwargs)
+        return expression.AND([domain, request.env['icecat.spec.value']._filter_domain(
+            _parse_spec_filters(self._get_spec_tokens()),
+            _parse_spec_ranges(self._get_spec_range_args()),
+        )])
+
+    def _shop_get_query_url_kwargs(self, *args, **kwargs):
+        # Keep the spec filters in the pager, sorting and category links
+        result = super()._shop_get_query_url_kwargs(*args, **kwargs)
+        result['spec'] = self._get_spec_tokens()
+        result.update(self._get_spec_range_args())
+        return result
+
+    def _get_facet_range(self, feature):
+        """Current bounds of a numerical facet and the other arguments its form must keep"""
+        names = (f'spec_min_{feature.id}', f'spec_max_{feature.id}')
+        args = request.httprequest.args
+        return {
+            'min_name': names[0],
+            'max_name': names[1],
+            'min': args.get(names[0], ''),
+            'max': args.get(names[1], ''),
+            'hidden': [
+                (key, value) for key, value in args.items(multi=True)
+                if key not in names and key != 'page'
+            ],
+        }
+
+    @http.route()
+    def shop(self, *args, **kwargs):
+        response = super().shop(*args, **kwargs)
+        qcontext = getattr(response, 'qcontext', None)
+        category = qcontext and qcontext.get('category')
+        if category:
+            tokens = self._get_spec_tokens()
+            facets = request.env['icecat.facet.count'].sudo()._get_facets(category, _parse_spec_filters(tokens))
+            for facet in facets:
+                for facet_value in facet['values']:
+                    token = f"{facet['feature'].id}:{facet_value['value']}"
+                    # The spec values of the link that toggles this value
+                    facet_value['spec'] = (
+                        [other for other in tokens if other != token] if facet_value['selected'] else tokens + [token]
+                    )
+                if facet['feature'].feature_type in NUMERIC_FEATURE_TYPES:
+                    facet['range'] = self._get_facet_range(facet['feature'])
+            qcontext['icecat_facets'] = facets
+            # The range forms submit to the first page of the current category
+            qcontext['icecat_facet_action'] = re.sub(r'/page/\d+/?$', '', request.httprequest.path)
+        return response
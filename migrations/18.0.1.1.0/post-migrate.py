@@ -0,0 +1,15 @@
+# -*- coding: utf-8 -*-
+
+from odoo import api, SUPERUSER_ID
+
+
+def migrate(cr, version):
+    """
+    Tot 18.0.1.1.0 las de connector een ontbrekende parameter als True; nu als
+    False. Zet de standaard aan-instellingen die nooit zijn opgeslagen, zodat
+    bestaande databases descriptions, afbeeldingen en auto sync blijven syncen.
+    """
+    if not version:
+        return
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    env['icecat.connector']._init_default_params()
@@ -4,5 +4,12 @@ from . import res_config_settings
 from . import product_template
 from . import icecat_connector
 from . import icecat_sync_log
+from . import icecat_sync_job
+from . import icecat_response_cache
+from . import icecat_negative_cache
+from . import icecat_catalog_index
+from . import icecat_spec
+from . import icecat_facet_count
 from . import icecat_category_mapping
+from . import product_category
 from . import product_image
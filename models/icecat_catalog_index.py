@@ -0,0 +1,308 @@
+# -*- coding: utf-8 -*-
+
+import glob
+import gzip
+import hashlib
+import heapq
+import logging
+import os
+import threading
+import xml.etree.ElementTree as ET
+from array import array
+from bisect import bisect_left
+from datetime import datetime
+
+from odoo import api, fields, models, _
+from odoo.exceptions import UserError
+from odoo.tools import config as odoo_config
+
+from .icecat_connector import normalize_gtin
+
+_logger = logging.getLogger(__name__)
+
+# Rows written per INSERT while streaming an index file
+INDEX_CHUNK_SIZE = 5000
+# GTINs sorted per run while building a GTIN set file; the runs are merged afterwards
+GTIN_SET_CHUNK_SIZE = 1000000
+
+
+class _ClosingGzipFile(gzip.GzipFile):
+    """GzipFile that also closes the file or HTTP response it reads from"""
+
+    def __init__(self, fileobj):
+        super().__init__(fileobj=fileobj)
+        self._source = fileobj
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            self._source.close()
+
+
+class IcecatGtinSet:
+    """
+    Membership test against a sorted array of 64-bit GTINs
+
+    About 8 bytes per GTIN; read-only once loaded, so one instance is shared
+    by every thread of the worker process.
+    """
+
+    def __init__(self, gtins):
+        self.gtins = gtins
+
+    def __contains__(self, gtin):
+        value = int(gtin)
+        idx = bisect_left(self.gtins, value)
+        return idx < len(self.gtins) and self.gtins[idx] == value
+
+    def __len__(self):
+        return len(self.gtins)
+
+
+_gtin_set_lock = threading.Lock()
+_gtin_set_cache = {}
+
+
+def _load_gtin_set(path):
+    """Return the IcecatGtinSet stored at ``path``, reloaded only when the file changed"""
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    with _gtin_set_lock:
+        cached = _gtin_set_cache.get(path)
+        if not cached or cached[0] != mtime:
+            gtins = array('Q')
+            with open(path, 'rb') as gtin_file:
+                gtins.frombytes(gtin_file.read())
+            cached = _gtin_set_cache[path] = (mtime, IcecatGtinSet(gtins))
+            _logger.info(f"Loaded {len(gtins)} Icecat GTINs from {path}")
+        return cached[1]
+
+
+class IcecatCatalogIndex(models.Model):
+    """
+    Compact GTIN -> Icecat product id / last update table
+
+    Filled by streaming Icecat's (daily or full) index files, so the update
+    cron only refreshes the products Icecat actually changed.
+    """
+    _name = 'icecat.catalog.index'
+    _description = 'Icecat Catalog Index'
+    _rec_name = 'gtin'
+    _log_access = False
+
+    gtin = fields.Char(string='GTIN', required=True)
+    icecat_id = fields.Integer(string='Icecat Product ID')
+    updated = fields.Datetime(string='Updated at Icecat')
+
+    _sql_constraints = [
+        ('gtin_unique', 'unique(gtin)', 'This GTIN is already in the Icecat index!'),
+    ]
+
+    @api.model
+    def _open_source(self, source, config):
+        """Open an index file from a local path or URL, transparently un-gzipping it"""
+        if source.startswith(('http://', 'https://')):
+            if not config.session:
+                raise UserError(_('Icecat credentials are required to download the index file.'))
+            response = config.session.get(
+                source,
+                headers={'Authorization': config.api_headers['Authorization']},
+                stream=True,
+                timeout=60,
+            )
+            try:
+                response.raise_for_status()
+            except Exception:
+                response.close()
+                raise
+            response.raw.decode_content = True
+            stream = response.raw
+        else:
+            if not os.path.isfile(source):
+                raise UserError(_('Icecat index file not found: %s') % source)
+            stream = open(source, 'rb')
+        if source.endswith('.gz'):
+            # GzipFile(fileobj=...) leaves the underlying stream open
+            return _ClosingGzipFile(stream)
+        return stream
+
+    @api.model
+    def _iter_index_entries(self, stream):
+        """
+        Stream ``<file>`` elements of an Icecat index and yield
+        (gtin, icecat_id, updated) for every valid EAN/UPC, in constant memory
+        """
+        open_elements = []
+        for event, element in ET.iterparse(stream, events=('start', 'end')):
+            if event == 'start':
+                open_elements.append(element)
+                continue
+            open_elements.pop()
+            if element.tag != 'file':
+                continue
+            try:
+                icecat_id = int(element.get('Product_ID') or 0) or None
+            except ValueError:
+                icecat_id = None
+            try:
+                updated = datetime.strptime(element.get('Updated', ''), '%Y%m%d%H%M%S')
+            except ValueError:
+                updated = None
+            for ean in element.iter('EAN_UPC'):
+                gtin = normalize_gtin(ean.get('Value'))
+                if gtin:
+                    yield gtin, icecat_id, updated
+            # Drop the handled element so the tree never grows
+            if open_elements:
+                open_elements[-1].remove(element)
+
+    @api.model
+    def _upsert_entries(self, rows):
+        """Insert or refresh index rows; an older timestamp never wins"""
+        gtins, icecat_ids, updated = zip(*rows)
+        self.env.cr.execute("""
+            INSERT INTO icecat_catalog_index (gtin, icecat_id, updated)
+            SELECT * FROM unnest(%s::varchar[], %s::int4[], %s::timestamp[])
+            ON CONFLICT (gtin) DO UPDATE
+               SET icecat_id = EXCLUDED.icecat_id, updated = EXCLUDED.updated
+             WHERE icecat_catalog_index.updated IS NULL
+                OR EXCLUDED.updated > icecat_catalog_index.updated
+        """, (list(gtins), list(icecat_ids), list(updated)))
+
+    @api.model
+    def _import_index(self, source=None, config=None):
+        """
+        Stream an Icecat index file (path or URL, optionally .gz) into the table
+
+        :return: number of GTINs read from the file
+        """
+        config = config or self.env['icecat.connector']._load_sync_config()
+        source = source or config.index_source
+        if not source:
+            raise UserError(_('No Icecat index source configured.'))
+
+        count = 0
+        rows = {}
+        with self._open_source(source, config) as stream:
+            for gtin, icecat_id, updated in self._iter_index_entries(stream):
+                # Last one wins within a chunk: ON CONFLICT cannot touch a row twice
+                rows[gtin] = (gtin, icecat_id, updated)
+                if len(rows) >= INDEX_CHUNK_SIZE:
+                    self._upsert_entries(list(rows.values()))
+                    count += len(rows)
+                    rows = {}
+            if rows:
+                self._upsert_entries(list(rows.values()))
+                count += len(rows)
+        self.invalidate_model()
+        _logger.info(f"Imported {count} GTINs from Icecat index {source}")
+        return count
+
+    @api.model
+    def _get_updated_products(self, limit=None):
+        """Synced products whose Icecat data changed after their last sync"""
+        self.env['product.template'].flush_model(['icecat_gtin', 'icecat_sync_status', 'icecat_last_sync', 'active'])
+        self.env.cr.execute("""
+            SELECT pt.id
+              FROM product_template pt
+              JOIN icecat_catalog_index ci ON ci.gtin = pt.icecat_gtin
+             WHERE pt.active
+               AND pt.icecat_sync_status = 'synced'
+               AND (pt.icecat_last_sync IS NULL OR ci.updated > pt.icecat_last_sync)
+               AND NOT EXISTS (
+                    SELECT 1
+                      FROM icecat_sync_job_product_rel rel
+                      JOIN icecat_sync_job job ON job.id = rel.job_id
+                     WHERE rel.product_tmpl_id = pt.id AND job.state IN ('pending', 'running')
+               )
+             ORDER BY pt.icecat_last_sync NULLS FIRST
+             LIMIT %s
+        """, (limit,))
+        return self.env['product.template'].browse([row[0] for row in self.env.cr.fetchall()])
+
+    @api.model
+    def _gtin_set_path(self, source):
+        # One file per product index source, so a set built from another source is never used
+        digest = hashlib.md5(source.encode()).hexdigest()[:12]
+        return os.path.join(odoo_config.filestore(self.env.cr.dbname), 'icecat', f'gtin_set_{digest}.bin')
+
+    @api.model
+    def _get_gtin_set(self, source):
+        """The availability set built from the product index ``source``, or None when there is none"""
+        if not source:
+            return None
+        return _load_gtin_set(self._gtin_set_path(source))
+
+    @api.model
+    def _build_gtin_set(self, source=None, config=None):
+        """
+        Stream the complete Icecat product index into a sorted GTIN set file
+        (written atomically)
+
+        Independent of the icecat_catalog_index table, which only holds what
+        the (daily) update index files brought in. GTINs are sorted in runs
+        that are merged, so the peak memory stays around 16 bytes per GTIN.
+
+        :return: number of GTINs in the set
+        """
+        config = config or self.env['icecat.connector']._load_sync_config()
+        source = source or config.catalog_source
+        if not source:
+            raise UserError(_('No Icecat product index file configured.'))
+
+        runs = []
+        chunk = []
+        with self._open_source(source, config) as stream:
+            for gtin, _icecat_id, _updated in self._iter_index_entries(stream):
+                chunk.append(int(gtin))
+                if len(chunk) >= GTIN_SET_CHUNK_SIZE:
+                    runs.append(array('Q', sorted(chunk)))
+                    chunk = []
+        if chunk:
+            runs.append(array('Q', sorted(chunk)))
+        gtins = array('Q')
+        last_gtin = None
+        for gtin in heapq.merge(*runs):
+            if gtin != last_gtin:
+                gtins.append(gtin)
+                last_gtin = gtin
+        del runs, chunk
+        if not gtins:
+            # An empty set would mark every product as unknown
+            _logger.warning(f"Icecat product index {source} holds no GTINs, GTIN set not written")
+            return 0
+
+        path = self._gtin_set_path(source)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as gtin_file:
+            gtins.tofile(gtin_file)
+        os.replace(tmp_path, path)
+        # Sets of previously configured sources are no longer used
+        for old_path in glob.glob(os.path.join(os.path.dirname(path), 'gtin_set_*.bin')):
+            if old_path != path:
+                os.remove(old_path)
+        _logger.info(f"Wrote {len(gtins)} Icecat GTINs from {source} to {path}")
+        return len(gtins)
+
+    @api.model
+    def cron_rebuild_gtin_set(self):
+        """Scheduled action: rebuild the GTIN set from the complete product index"""
+        config = self.env['icecat.connector']._load_sync_config()
+        if not config.availability_check:
+            return
+        if not config.catalog_source:
+            _logger.warning("Icecat availability check is enabled without a product index file, GTIN set not built")
+            return
+        return self._build_gtin_set(config=config)
+
+    @api.model
+    def cron_import_index(self):
+        """Scheduled action refreshing the index before the nightly update run"""
+        config = self.env['icecat.connector']._load_sync_config()
+        if not config.auto_sync_enabled or config.update_mode != 'index' or not config.index_source:
+            return
+        return self._import_index(config=config)
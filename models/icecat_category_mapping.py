@@ -2,6 +2,40 @@
 
 from odoo import api, fields, models, _
 
+# Bumped whenever a mapping or a category is written in this process; a
+# IcecatCategoryCache filled under an older generation is discarded.
+_cache_generation = [0]
+
+
+def invalidate_category_caches():
+    _cache_generation[0] += 1
+
+
+class IcecatCategoryCache:
+    """
+    Per-run cache of resolved category paths and of mappings by Icecat category
+
+    Category paths are cached per model and per path prefix, so sibling
+    categories share their resolved parents. The cache empties itself when
+    mappings or categories were written since it was filled; its own writes
+    are adopted with ``adopt_writes``.
+    """
+
+    def __init__(self):
+        self.generation = _cache_generation[0]
+        self.category_ids = {}
+        self.mapping_ids = {}
+
+    def validate(self):
+        if self.generation != _cache_generation[0]:
+            self.category_ids.clear()
+            self.mapping_ids.clear()
+            self.generation = _cache_generation[0]
+
+    def adopt_writes(self):
+        """Our own writes keep the cache valid: take over the current generation"""
+        self.generation = _cache_generation[0]
+
 
 class IcecatCategoryMapping(models.Model):
     _name = 'icecat.category.mapping'
@@ -53,11 +87,29 @@ class IcecatCategoryMapping(models.Model):
                 ('icecat_category', '=', mapping.icecat_category)
             ])
 
+    @api.model_create_multi
+    def create(self, vals_list):
+        invalidate_category_caches()
+        return super().create(vals_list)
+
+    def write(self, vals):
+        invalidate_category_caches()
+        return super().write(vals)
+
+    def unlink(self):
+        invalidate_category_caches()
+        return super().unlink()
+
     @api.model
-    def get_mapping(self, icecat_category):
+    def get_mapping(self, icecat_category, cache=None):
         """Get mapping for an Icecat category, create default if not exists"""
         if not icecat_category:
             return None
+
+        if cache is not None:
+            cache.validate()
+            if icecat_category in cache.mapping_ids:
+                return self.browse(cache.mapping_ids[icecat_category])
         
         mapping = self.search([('icecat_category', '=', icecat_category)], limit=1)
         
@@ -67,11 +119,15 @@ class IcecatCategoryMapping(models.Model):
                 'icecat_category': icecat_category,
                 'auto_publish': True,  # Auto-publish by default
             })
+
+        if cache is not None:
+            cache.adopt_writes()
+            cache.mapping_ids[icecat_category] = mapping.id
         
         return mapping
 
     @api.model
-    def _create_category_hierarchy(self, category_path, model_name):
+    def _create_category_hierarchy(self, category_path, model_name, cache=None):
         """
         Create a category hierarchy from a path like 'Electronics > Computers > Monitors'
         Returns the deepest (leaf) category
@@ -84,8 +140,16 @@ class IcecatCategoryMapping(models.Model):
         
         parent = None
         category_obj = self.env[model_name]
+
+        if cache is not None:
+            cache.validate()
         
-        for part in parts:
+        for depth, part in enumerate(parts):
+            cache_key = (model_name, tuple(parts[:depth + 1]))
+            if cache is not None and cache_key in cache.category_ids:
+                parent = category_obj.browse(cache.category_ids[cache_key])
+                continue
+
             # Search for existing category with this name and parent
             domain = [('name', '=', part)]
             if parent:
@@ -101,15 +165,23 @@ class IcecatCategoryMapping(models.Model):
                 if parent:
                     vals['parent_id'] = parent.id
                 category = category_obj.create(vals)
+
+            if cache is not None:
+                cache.adopt_writes()
+                cache.category_ids[cache_key] = category.id
             
             parent = category
         
         return parent  # Return the deepest category
 
     @api.model
-    def apply_mapping(self, product, icecat_category):
-        """Apply category mapping to a product"""
-        mapping = self.get_mapping(icecat_category)
+    def apply_mapping(self, product, icecat_category, cache=None):
+        """
+        Apply category mapping to a product
+
+        :param cache: optional IcecatCategoryCache shared by a sync run
+        """
+        mapping = self.get_mapping(icecat_category, cache=cache)
         
         if not mapping:
             return {}
@@ -122,16 +194,20 @@ class IcecatCategoryMapping(models.Model):
             
             # Create website category hierarchy if not manually set
             if not mapping.odoo_category_id:
-                website_cat = self._create_category_hierarchy(google_cat_name, 'product.public.category')
+                website_cat = self._create_category_hierarchy(google_cat_name, 'product.public.category', cache=cache)
                 if website_cat:
                     mapping.write({'odoo_category_id': website_cat.id})
+                    if cache is not None:
+                        cache.adopt_writes()
             
             # Create internal category hierarchy if not manually set
             if not mapping.internal_category_id:
                 # For internal categories, we might want to prepend "All" as root
-                internal_cat = self._create_category_hierarchy(google_cat_name, 'product.category')
+                internal_cat = self._create_category_hierarchy(google_cat_name, 'product.category', cache=cache)
                 if internal_cat:
                     mapping.write({'internal_category_id': internal_cat.id})
+                    if cache is not None:
+                        cache.adopt_writes()
         
         # Set website category
         if mapping.odoo_category_id:
@@ -1,15 +1,683 @@
 # -*- coding: utf-8 -*-
 
 import base64
+import hashlib
+import json
 import logging
+import math
+import random
+import re
+import threading
+import time
 import requests
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime
+from email.utils import parsedate_to_datetime
+from requests.adapters import HTTPAdapter
 
 from odoo import api, fields, models, _
 from odoo.exceptions import UserError
 
+from .icecat_category_mapping import IcecatCategoryCache
+from .icecat_sync_job import DEFAULT_COMMIT_CHUNK_SIZE, DEFAULT_LEASE_MINUTES
+
 _logger = logging.getLogger(__name__)
 
+DEFAULT_FETCH_WORKERS = 4
+USER_AGENT = 'Odoo/18.0 Icecat-Module'
+IMAGE_CHUNK_SIZE = 64 * 1024
+MAX_IMAGE_BYTES = 20 * 1024 * 1024
+# Products whose images are downloaded and applied together; bounds the image bytes held in memory
+IMAGE_APPLY_BATCH_SIZE = 5
+
+DEFAULT_REQUESTS_PER_SECOND = 5.0
+DEFAULT_MAX_RETRIES = 3
+# Transient answers worth retrying (besides timeouts and connection errors)
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+BACKOFF_BASE = 1.0
+BACKOFF_CAP = 30.0
+MAX_RETRY_AFTER = 120.0
+DEFAULT_CIRCUIT_BREAKER_THRESHOLD = 5
+DEFAULT_NEGATIVE_CACHE_DAYS = 30
+# Failures that say something about Icecat or our account, not about the product
+SYSTEMIC_ERROR_CODES = ('auth', 'connection', 'timeout', 'throttled')
+# A 429 halves the rate, never below this part of the configured rate;
+# every successful request wins back this part of the configured rate
+MIN_RATE_RATIO = 0.1
+RATE_RECOVERY_STEP = 0.05
+
+# Icecat gallery renditions, from large to small
+IMAGE_SIZE_KEYS = {
+    'high': 'Pic',
+    'medium': 'Pic500x500',
+    'low': 'LowPic',
+    'thumb': 'ThumbPic',
+}
+
+ICECAT_ATTRIBUTE_PREFIX = '[Icecat]'
+
+# Settings that are on after installation (a parameter that is switched off is deleted)
+DEFAULT_PARAMS = {
+    'auto_sync_enabled': 'True',
+    'sync_description': 'True',
+    'sync_images': 'True',
+}
+
+# Icecat feature types whose values are numbers (in the unit of the feature)
+NUMERIC_FEATURE_TYPES = ('numerical',)
+# Icecat measure signs -> (canonical unit, factor to the canonical unit);
+# other units are their own canonical unit
+SPEC_UNITS = {
+    'mm': ('mm', 1.0), 'cm': ('mm', 10.0), 'm': ('mm', 1000.0),
+    '"': ('"', 1.0), 'inch': ('"', 1.0),
+    'mg': ('kg', 0.000001), 'g': ('kg', 0.001), 'kg': ('kg', 1.0),
+    'Hz': ('Hz', 1.0), 'kHz': ('Hz', 1e3), 'MHz': ('Hz', 1e6), 'GHz': ('Hz', 1e9),
+    'MB': ('GB', 0.001), 'GB': ('GB', 1.0), 'TB': ('GB', 1000.0),
+    'mW': ('W', 0.001), 'W': ('W', 1.0), 'kW': ('W', 1000.0),
+    'ms': ('s', 0.001), 's': ('s', 1.0), 'min': ('s', 60.0), 'h': ('s', 3600.0),
+}
+_SPEC_NUMBER_RE = re.compile(r'^\s*([-+]?\d+(?:[.,]\d+)?)\s*(.*?)\s*$')
+
+# IcecatSyncConfig attributes that influence what is written to a product
+SYNC_FINGERPRINT_OPTIONS = (
+    'lang', 'sync_description', 'sync_images', 'sync_attributes',
+    'main_image_size', 'gallery_image_size',
+)
+
+# One keep-alive HTTP session per worker process, shared by the fetch threads.
+# It is rebuilt when the credentials, API URL or pool size change.
+_http_session_lock = threading.Lock()
+_http_session_state = {'key': None, 'session': None, 'api_headers': None}
+
+
+def _get_http_session(username, password, api_url, pool_size):
+    """
+    Return the process-wide ``requests.Session`` and the prebuilt API headers
+
+    The Basic-auth header is only encoded when the session is (re)built. It is
+    sent with API requests only, never with the image downloads.
+    """
+    key = (username, password, api_url, pool_size)
+    with _http_session_lock:
+        if _http_session_state['key'] != key:
+            old_session = _http_session_state['session']
+
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            session.headers.update({
+                'User-Agent': USER_AGENT,
+                'Accept-Encoding': 'gzip, deflate',
+            })
+
+            auth_b64 = base64.b64encode(f"{username}:{password}".encode('ascii')).decode('ascii')
+            _http_session_state.update({
+                'key': key,
+                'session': session,
+                'api_headers': {
+                    'Authorization': f'Basic {auth_b64}',
+                    'Accept': 'application/json',
+                },
+            })
+            if old_session is not None:
+                old_session.close()
+            _logger.info("Icecat HTTP session (re)built with a pool of %s connections", pool_size)
+
+        return _http_session_state['session'], _http_session_state['api_headers']
+
+
+class IcecatRateLimiter:
+    """
+    Token bucket limiting the Icecat API requests of this worker process
+
+    Shared by all fetch threads. Every request takes a token and tokens refill
+    at the current rate. A 429 halves the rate and, when Icecat sends a
+    ``Retry-After``, pauses every thread until then; each successful request
+    brings the rate back up towards the configured maximum. A rate of 0 means
+    unlimited. The counters are cumulative, like the connection pool stats.
+    """
+
+    def __init__(self, max_rate):
+        self.max_rate = max_rate
+        self.rate = max_rate
+        self.capacity = max(1.0, max_rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.lock = threading.Lock()
+        self.counters = {'throttled': 0, 'retries': 0, 'wait': 0.0}
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        """Block until a request may be sent"""
+        if not self.max_rate:
+            return
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self.blocked_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    self.counters['wait'] += waited
+                    return
+                delay = max(self.blocked_until - now, (1 - self.tokens) / self.rate)
+            time.sleep(delay)
+            waited += delay
+
+    def throttle(self, retry_after=None):
+        """Icecat answered 429: slow down, and pause everyone when asked to"""
+        with self.lock:
+            self.counters['throttled'] += 1
+            if not self.max_rate:
+                return
+            self._refill(time.monotonic())
+            self.rate = max(self.max_rate * MIN_RATE_RATIO, self.rate / 2)
+            if retry_after:
+                self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+
+    def recover(self):
+        with self.lock:
+            if self.max_rate and self.rate < self.max_rate:
+                self._refill(time.monotonic())
+                self.rate = min(self.max_rate, self.rate + self.max_rate * RATE_RECOVERY_STEP)
+
+    def record_retry(self):
+        with self.lock:
+            self.counters['retries'] += 1
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counters)
+
+
+_rate_limiter_lock = threading.Lock()
+_rate_limiter_state = {'rate': None, 'limiter': None}
+
+
+def _get_rate_limiter(rate):
+    """Return the process-wide IcecatRateLimiter, rebuilt when the rate changes"""
+    with _rate_limiter_lock:
+        if _rate_limiter_state['rate'] != rate:
+            _rate_limiter_state.update({'rate': rate, 'limiter': IcecatRateLimiter(rate)})
+        return _rate_limiter_state['limiter']
+
+
+def _parse_retry_after(value):
+    """Seconds to wait according to a Retry-After header (seconds or HTTP date)"""
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            retry_at = parsedate_to_datetime(value)
+            seconds = (retry_at - datetime.now(retry_at.tzinfo)).total_seconds()
+        except (TypeError, ValueError):
+            return None
+    return min(max(seconds, 0.0), MAX_RETRY_AFTER)
+
+
+def _is_systemic_failure(result):
+    """True when a fetch failed because of Icecat or our account, not the product"""
+    error_code = result.get('error_code')
+    if error_code in SYSTEMIC_ERROR_CODES or error_code == 'circuit_open':
+        return True
+    return error_code == 'http' and (result.get('status_code') or 0) >= 500
+
+
+class IcecatCircuitBreaker:
+    """
+    Circuit breaker of one sync run, shared by its fetch threads
+
+    ``closed``: requests pass; ``threshold`` consecutive systemic failures
+    open the circuit. ``open``: requests are refused without touching the
+    network. ``half_open``: a single probe request is let through while the
+    other threads wait for its outcome, which closes or reopens the circuit.
+    A run that starts with a persisted ``open`` state begins half open.
+    A threshold of 0 disables the breaker.
+    """
+
+    def __init__(self, threshold, state='closed', opened_at=None):
+        self.threshold = threshold
+        self.state = 'half_open' if state in ('open', 'half_open') else 'closed'
+        self.opened_at = opened_at
+        self.failures = 0
+        self.last_error = None
+        self.probing = False
+        self.condition = threading.Condition()
+
+    def allow(self):
+        """Return whether a request may be sent now"""
+        if not self.threshold:
+            return True
+        with self.condition:
+            while self.state == 'half_open' and self.probing:
+                self.condition.wait()
+            if self.state == 'open':
+                return False
+            if self.state == 'half_open':
+                self.probing = True
+            return True
+
+    def record(self, result):
+        """Feed the outcome of a request that ``allow`` let through"""
+        if not self.threshold:
+            return
+        with self.condition:
+            if _is_systemic_failure(result):
+                self.failures += 1
+                self.last_error = result.get('error_detail') or result.get('error_code')
+                if self.state != 'open' and (self.state == 'half_open' or self.failures >= self.threshold):
+                    self.state = 'open'
+                    self.opened_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                    _logger.warning(
+                        f"Icecat circuit breaker opened after {self.failures} systemic failures "
+                        f"(last: {self.last_error}), skipping the remaining requests of this run"
+                    )
+            else:
+                if self.state != 'closed':
+                    _logger.info("Icecat circuit breaker closed again")
+                self.failures = 0
+                self.state = 'closed'
+            self.probing = False
+            self.condition.notify_all()
+
+    @property
+    def is_open(self):
+        return self.state == 'open'
+
+
+def _backoff_delay(attempt):
+    """Exponential backoff with full jitter"""
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+
+def _get_with_retries(config, url, headers):
+    """
+    GET an Icecat API URL through the rate limiter, retrying transient failures
+
+    Timeouts, connection errors, 429 and 5xx answers are retried up to
+    ``config.max_retries`` times, waiting ``Retry-After`` when Icecat sends
+    it and an exponential backoff with jitter otherwise. The last response
+    (or exception) is returned (or raised) as is.
+    """
+    limiter = config.rate_limiter
+    attempt = 0
+    while True:
+        if limiter:
+            limiter.acquire()
+        try:
+            response = config.session.get(url, headers=headers, timeout=30)
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError):
+            if attempt >= config.max_retries:
+                raise
+            delay = _backoff_delay(attempt)
+        else:
+            if response.status_code not in RETRY_STATUS_CODES:
+                if limiter:
+                    limiter.recover()
+                return response
+            retry_after = _parse_retry_after(response.headers.get('Retry-After'))
+            if response.status_code == 429 and limiter:
+                limiter.throttle(retry_after)
+            if attempt >= config.max_retries:
+                return response
+            response.close()
+            delay = retry_after if retry_after is not None else _backoff_delay(attempt)
+
+        attempt += 1
+        if limiter:
+            limiter.record_retry()
+        _logger.warning(f"Icecat request failed transiently, retry {attempt}/{config.max_retries} in {delay:.1f}s")
+        time.sleep(delay)
+
+
+def normalize_gtin(barcode):
+    """
+    Return a barcode as a 14-digit GTIN, or False when it is not a valid GTIN
+
+    GTIN-8, GTIN-12 (UPC-A), GTIN-13 (EAN) and GTIN-14 are left-padded with
+    zeros to 14 digits and accepted only when their check digit is right, so
+    internal codes and typos never reach Icecat.
+    """
+    code = ''.join(str(barcode or '').split())
+    if not code.isdigit() or len(code) not in (8, 12, 13, 14):
+        return False
+    code = code.zfill(14)
+    total = sum(int(digit) * (3 if idx % 2 == 0 else 1) for idx, digit in enumerate(code[:13]))
+    if (10 - total % 10) % 10 != int(code[13]):
+        return False
+    return code
+
+
+def canonical_unit(unit):
+    """Return (canonical unit, factor to it) of an Icecat measure sign"""
+    unit = (unit or '').strip()
+    return SPEC_UNITS.get(unit, (unit, 1.0))
+
+
+def parse_spec_number(value, unit='', feature_type=''):
+    """
+    Numeric value of a spec, converted to the canonical unit of ``unit``
+
+    Only for numerical features. The value may carry its own unit ("1.2 kg",
+    "27 \""); it is then converted, or rejected when it is another quantity.
+
+    :return: float, or None when the value is not a plain number
+    """
+    if feature_type not in NUMERIC_FEATURE_TYPES:
+        return None
+    match = _SPEC_NUMBER_RE.match(str(value or ''))
+    if not match:
+        return None
+    number, value_unit = match.groups()
+    target_unit, factor = canonical_unit(unit)
+    if value_unit:
+        value_target, factor = canonical_unit(value_unit)
+        if value_target != target_unit:
+            return None
+    number = float(number.replace(',', '.')) * factor
+    return number if math.isfinite(number) else None
+
+
+def _icecat_request_code(gtin):
+    """Icecat knows products by EAN-13: drop the padding zero of a 14-digit GTIN"""
+    return gtin[1:] if len(gtin) == 14 and gtin.startswith('0') else gtin
+
+
+def _decode_json(raw):
+    """Decode a raw Icecat body, ``None`` when it is not valid JSON"""
+    try:
+        return json.loads(raw)
+    except ValueError as e:
+        _logger.error(f"Failed to parse JSON response: {e}")
+        return None
+
+
+def _sync_fingerprint(content_hash, config):
+    """
+    Hash of an Icecat payload combined with the options it is applied with
+
+    A product whose stored fingerprint matches can skip the whole apply stage.
+    """
+    options = '|'.join(str(getattr(config, key)) for key in SYNC_FINGERPRINT_OPTIONS)
+    return hashlib.sha256(f"{content_hash}|{options}".encode()).hexdigest()
+
+
+def _select_image_url(image_info, size):
+    """
+    URL of the requested rendition of a gallery image
+
+    Falls back to the next smaller rendition, then to larger ones, when
+    Icecat does not provide the requested size.
+    """
+    urls = image_info.get('urls') or {}
+    sizes = list(IMAGE_SIZE_KEYS)
+    start = sizes.index(size) if size in sizes else 0
+    for candidate in sizes[start:] + sizes[:start][::-1]:
+        if urls.get(candidate):
+            return urls[candidate]
+    return image_info.get('url')
+
+
+def _http_pool_stats(session):
+    """Total requests sent and connections opened by the pools of a session"""
+    stats = {'requests': 0, 'connections': 0}
+    for adapter in set(session.adapters.values()):
+        pools = adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is not None:
+                stats['requests'] += pool.num_requests
+                stats['connections'] += pool.num_connections
+    return stats
+
+
+def _http_stats(config):
+    """Connection pool and rate limiter counters, see ``_report_http_stats``"""
+    stats = _http_pool_stats(config.session)
+    if config.rate_limiter:
+        stats.update(config.rate_limiter.stats())
+    return stats
+
+
+def _request_icecat_json(config, ean_code, validators=None):
+    """
+    Request the Icecat JSON for one EAN/GTIN.
+
+    Runs inside the fetch worker threads, so it only uses ``config`` and
+    never the ORM. On success the raw body is returned undecoded together with
+    its sha256 hash. Failures are returned as an ``error_code`` which the
+    connector turns into a translated message in the calling thread.
+
+    :param validators: optional dict with the cached ``etag`` and
+        ``last_modified``; a 304 answer is returned as ``not_modified``
+    """
+    username = config.username
+
+    # Ensure EAN code is a string
+    ean_code = str(ean_code or '').strip()
+
+    # Log the barcode we received
+    _logger.info(f"Received EAN code: '{ean_code}' (type: {type(ean_code).__name__})")
+
+    # Ensure EAN code is not empty
+    if not ean_code:
+        _logger.error("EAN code is empty!")
+        return {'success': False, 'error_code': 'empty_ean', 'error_detail': 'EAN code is empty'}
+
+    # Construct the API endpoint for EAN lookup
+    # Format: https://live.icecat.biz/api?lang=EN&shopname=username&GTIN=EAN&content=
+    url = f"{config.api_url}?lang={config.lang}&shopname={username}&GTIN={_icecat_request_code(ean_code)}&content="
+
+    _logger.info(f"Requesting Icecat data for EAN: {ean_code}")
+
+    try:
+        headers = config.api_headers
+        if validators:
+            headers = dict(headers)
+            if validators.get('etag'):
+                headers['If-None-Match'] = validators['etag']
+            if validators.get('last_modified'):
+                headers['If-Modified-Since'] = validators['last_modified']
+
+        response = _get_with_retries(config, url, headers)
+
+        # Log response status and URL
+        _logger.info(f"Icecat API URL: {url}")
+        _logger.info(f"Icecat API response status: {response.status_code}")
+        if response.status_code not in (200, 304):
+            _logger.error(f"Icecat API response body: {response.text[:500]}")
+
+        if response.status_code == 304 and validators:
+            return {
+                'success': True,
+                'not_modified': True,
+                'etag': response.headers.get('ETag') or validators.get('etag'),
+                'last_modified': response.headers.get('Last-Modified') or validators.get('last_modified'),
+            }
+        elif response.status_code == 200:
+            raw = response.content
+            return {
+                'success': True,
+                'raw': raw,
+                'content_hash': hashlib.sha256(raw).hexdigest(),
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+            }
+        elif response.status_code == 404:
+            # Check if it's a brand restriction vs product not found
+            try:
+                error_data = response.json()
+                if 'brand restrictions' in error_data.get('Message', '').lower():
+                    return {'success': False, 'error_code': 'brand_restricted'}
+            except Exception:
+                pass
+            return {'success': False, 'error_code': 'not_found'}
+        elif response.status_code == 401:
+            return {'success': False, 'error_code': 'auth'}
+        elif response.status_code == 429:
+            return {'success': False, 'error_code': 'throttled'}
+        else:
+            error_msg = f"Icecat API error: {response.status_code}"
+            try:
+                error_data = response.json()
+                error_msg += f" - {error_data.get('message', '')}"
+            except Exception:
+                error_msg += f" - {response.text[:200]}"
+
+            _logger.error(error_msg)
+            return {
+                'success': False,
+                'error_code': 'http',
+                'error_detail': error_msg,
+                'status_code': response.status_code,
+            }
+
+    except requests.exceptions.Timeout:
+        _logger.error("Icecat API request timed out")
+        return {'success': False, 'error_code': 'timeout'}
+    except requests.exceptions.ConnectionError:
+        _logger.error("Failed to connect to Icecat API")
+        return {'success': False, 'error_code': 'connection'}
+    except Exception as e:
+        error_msg = f"Unexpected error: {str(e)}"
+        _logger.exception(error_msg)
+        return {'success': False, 'error_code': 'unexpected', 'error_detail': error_msg}
+
+
+@dataclass(frozen=True)
+class IcecatSyncConfig:
+    """
+    Immutable snapshot of the Icecat settings, loaded once per batch
+
+    Built by ``icecat.connector._load_sync_config``. Besides the parsed
+    settings it carries the process-wide HTTP session and the prebuilt API
+    headers, so the fetch threads never need ``self.env``.
+    """
+    username: str
+    has_credentials: bool
+    api_url: str
+    lang: str
+    catalog_type: str
+    auto_sync_enabled: bool
+    new_product_batch_size: int
+    update_batch_size: int
+    fetch_workers: int
+    sync_description: bool
+    sync_images: bool
+    sync_attributes: bool
+    main_image_size: str
+    gallery_image_size: str
+    image_max_bytes: int
+    job_lease_minutes: int
+    commit_chunk_size: int
+    requests_per_second: float
+    max_retries: int
+    negative_cache_days: int
+    update_mode: str
+    index_source: str
+    availability_check: bool
+    catalog_source: str
+    session: object = None
+    api_headers: object = None
+    rate_limiter: object = None
+    circuit_breaker: object = None
+    gtin_set: object = None
+
+
+class IcecatAttributeResolver:
+    """
+    Per-run, in-memory index of the [Icecat] product attributes and values
+
+    Everything is loaded once; missing attributes are created with a single
+    multi-create and missing values with a single multi-create per attribute.
+    """
+
+    def __init__(self, env):
+        self.env = env
+        self.attribute_ids = {}
+        self.value_ids = defaultdict(dict)
+
+        for attribute in env['product.attribute'].with_context(active_test=False).search_read(
+            [('name', '=like', f'{ICECAT_ATTRIBUTE_PREFIX}%')], ['name'], order='id'
+        ):
+            self.attribute_ids.setdefault(attribute['name'], attribute['id'])
+        if self.attribute_ids:
+            for value in env['product.attribute.value'].with_context(active_test=False).search_read(
+                [('attribute_id', 'in', list(self.attribute_ids.values()))],
+                ['attribute_id', 'name'], order='id'
+            ):
+                self.value_ids[value['attribute_id'][0]].setdefault(value['name'], value['id'])
+
+    @staticmethod
+    def _group_specifications(specifications):
+        """Group specs per attribute name, as "Spec Name: Value" value names"""
+        groups = {}
+        for spec in specifications:
+            spec_name = spec.get('name')
+            spec_value = str(spec.get('value', ''))
+            if not spec_name or not spec_value:
+                continue
+            # Attribute name: [Icecat] Group → auto-groups in backend
+            attr_name = f"{ICECAT_ATTRIBUTE_PREFIX} {spec.get('group') or 'Algemeen'}"
+            groups.setdefault(attr_name, {})[f"{spec_name}: {spec_value}"] = True
+        return groups
+
+    def _ensure_attributes(self, names):
+        missing = sorted(name for name in names if name not in self.attribute_ids)
+        if missing:
+            attributes = self.env['product.attribute'].create([{
+                'name': name,
+                'display_type': 'select',
+                'create_variant': 'no_variant',  # Don't create product variants
+            } for name in missing])
+            self.attribute_ids.update(zip(missing, attributes.ids))
+
+    def _ensure_values(self, attribute_id, names):
+        known = self.value_ids[attribute_id]
+        missing = [name for name in names if name not in known]
+        if missing:
+            values = self.env['product.attribute.value'].create([
+                {'attribute_id': attribute_id, 'name': name} for name in missing
+            ])
+            known.update(zip(missing, values.ids))
+
+    def resolve(self, specifications):
+        """
+        Resolve the specifications of a batch to attribute and value ids
+
+        :param specifications: dict mapping a key (product id) to a spec list
+        :return: dict mapping the same key to ``{attribute_id: [value_ids]}``
+        """
+        grouped = {key: self._group_specifications(specs) for key, specs in specifications.items()}
+
+        self._ensure_attributes({name for groups in grouped.values() for name in groups})
+
+        wanted_values = defaultdict(dict)
+        for groups in grouped.values():
+            for attr_name, value_names in groups.items():
+                wanted_values[self.attribute_ids[attr_name]].update(value_names)
+        for attribute_id, value_names in wanted_values.items():
+            self._ensure_values(attribute_id, list(value_names))
+
+        return {
+            key: {
+                self.attribute_ids[attr_name]: [
+                    self.value_ids[self.attribute_ids[attr_name]][name] for name in value_names
+                ]
+                for attr_name, value_names in groups.items()
+            }
+            for key, groups in grouped.items()
+        }
+
 
 class IcecatConnector(models.AbstractModel):
     _name = 'icecat.connector'
@@ -24,10 +692,35 @@ class IcecatConnector(models.AbstractModel):
         )
 
     @api.model
-    def _cfg_bool(self, key, default=False):
-        """Veilige boolean uit ir.config_parameter"""
+    def _save_circuit_state(self, breaker):
+        """Persist the breaker state so the next run (in any worker) starts half open"""
+        if not breaker or not breaker.threshold:
+            return
+        ICP = self.env['ir.config_parameter'].sudo()
+        state = 'open' if breaker.state == 'half_open' and breaker.opened_at else breaker.state
+        if self._get_config_param('circuit_state', 'closed') != state:
+            ICP.set_param('icecat_product_enrichment.circuit_state', state)
+            ICP.set_param('icecat_product_enrichment.circuit_opened_at', breaker.opened_at or '')
+
+    @api.model
+    def _init_default_params(self):
+        """Seed the default settings at installation and on upgrade to 18.0.1.1.0, without touching saved ones"""
+        ICP = self.env['ir.config_parameter'].sudo()
+        for key, value in DEFAULT_PARAMS.items():
+            if ICP.get_param(f'icecat_product_enrichment.{key}') is False:
+                ICP.set_param(f'icecat_product_enrichment.{key}', value)
+
+    @api.model
+    def _cfg_bool(self, key):
+        """
+        Veilige boolean uit ir.config_parameter
+
+        De instellingen verwijderen de parameter bij False, dus een ontbrekende
+        parameter is False; de standaard True-waarden staan in
+        data/ir_config_parameter_data.xml.
+        """
         val = self._get_config_param(key)
-        return str(val).lower() in ('true', '1', 'yes', 'on')
+        return str(val or '').strip().lower() in ('true', '1', 'yes', 'on')
 
     @api.model
     def _cfg_int(self, key, default=0):
@@ -38,23 +731,130 @@ class IcecatConnector(models.AbstractModel):
             return default
 
     @api.model
-    def _get_api_credentials(self):
-        """Get Icecat API credentials from settings"""
-        username = self._get_config_param('username')
-        password = self._get_config_param('password')
-        
-        if not username or not password:
+    def _cfg_float(self, key, default=0.0):
+        val = self._get_config_param(key)
+        try:
+            return float(val)
+        except (TypeError, ValueError):
+            return default
+
+    @api.model
+    def _get_api_url(self):
+        """Get Icecat API base URL"""
+        return self._get_config_param('api_url', 'https://live.icecat.biz/api')
+
+    @api.model
+    def _get_icecat_lang(self):
+        """Map the Odoo language from the context to an Icecat language code"""
+        lang_code = self.env.context.get('lang') or 'nl_NL'
+        return 'nl' if lang_code.startswith('nl') else 'en'
+
+    @api.model
+    def _load_sync_config(self):
+        """
+        Read every Icecat setting once and return an immutable IcecatSyncConfig
+
+        Strings are parsed here, once per batch, with the same rules for every
+        boolean. The snapshot is passed through the whole sync pipeline,
+        including the fetch threads, which may not touch ``self.env``.
+        """
+        username = self._get_config_param('username') or ''
+        password = self._get_config_param('password') or ''
+        api_url = self._get_api_url()
+        fetch_workers = self._cfg_int('fetch_workers', DEFAULT_FETCH_WORKERS) or DEFAULT_FETCH_WORKERS
+        requests_per_second = max(self._cfg_float('requests_per_second', DEFAULT_REQUESTS_PER_SECOND), 0.0)
+        catalog_type = self._get_config_param('catalog_type') or 'open'
+        availability_check = self._cfg_bool('availability_check')
+        catalog_source = (self._get_config_param('catalog_source') or '').strip()
+        gtin_set = None
+        if availability_check and catalog_source:
+            gtin_set = self.env['icecat.catalog.index']._get_gtin_set(catalog_source)
+
+        session = api_headers = None
+        if username and password:
+            session, api_headers = _get_http_session(
+                username, password, api_url, max(fetch_workers, DEFAULT_FETCH_WORKERS)
+            )
+
+        return IcecatSyncConfig(
+            username=username,
+            has_credentials=bool(username and password),
+            api_url=api_url,
+            lang=self._get_icecat_lang(),
+            catalog_type=catalog_type,
+            auto_sync_enabled=self._cfg_bool('auto_sync_enabled'),
+            new_product_batch_size=self._cfg_int('new_product_batch_size', 10) or 10,
+            update_batch_size=self._cfg_int('update_batch_size', 100) or 100,
+            fetch_workers=fetch_workers,
+            sync_description=self._cfg_bool('sync_description'),
+            sync_images=self._cfg_bool('sync_images'),
+            sync_attributes=self._cfg_bool('sync_attributes'),
+            main_image_size=self._get_config_param('main_image_size') or 'high',
+            gallery_image_size=self._get_config_param('gallery_image_size') or 'high',
+            image_max_bytes=(self._cfg_int('image_max_kb', 0) * 1024) or MAX_IMAGE_BYTES,
+            job_lease_minutes=self._cfg_int('job_lease_minutes', DEFAULT_LEASE_MINUTES) or DEFAULT_LEASE_MINUTES,
+            commit_chunk_size=self._cfg_int('commit_chunk_size', DEFAULT_COMMIT_CHUNK_SIZE) or DEFAULT_COMMIT_CHUNK_SIZE,
+            requests_per_second=requests_per_second,
+            max_retries=max(self._cfg_int('max_retries', DEFAULT_MAX_RETRIES), 0),
+            negative_cache_days=max(self._cfg_int('negative_cache_days', DEFAULT_NEGATIVE_CACHE_DAYS), 0),
+            update_mode=self._get_config_param('update_mode') or 'age',
+            index_source=(self._get_config_param('index_source') or '').strip(),
+            availability_check=availability_check,
+            catalog_source=catalog_source,
+            gtin_set=gtin_set,
+            session=session,
+            api_headers=api_headers,
+            rate_limiter=_get_rate_limiter(requests_per_second),
+            circuit_breaker=IcecatCircuitBreaker(
+                max(self._cfg_int('circuit_breaker_threshold', DEFAULT_CIRCUIT_BREAKER_THRESHOLD), 0),
+                state=self._get_config_param('circuit_state') or 'closed',
+                opened_at=self._get_config_param('circuit_opened_at'),
+            ),
+        )
+
+    @api.model
+    def _check_credentials(self, config):
+        """Raise when the snapshot has no Icecat credentials"""
+        if not config.has_credentials:
             raise UserError(_(
                 'Icecat credentials not configured. '
                 'Please configure them in Website Settings > Icecat Configuration.'
             ))
-        
-        return username, password
 
     @api.model
-    def _get_api_url(self):
-        """Get Icecat API base URL"""
-        return self._get_config_param('api_url', 'https://live.icecat.biz/api')
+    def _api_error_result(self, fetch_result):
+        """Turn an error code from the fetch stage into a (translated) sync result"""
+        error_code = fetch_result.get('error_code')
+        if error_code == 'brand_restricted':
+            return {
+                'success': False,
+                'error': _('Product has brand restrictions. This product requires Full Icecat subscription.'),
+                'status': 'no_data'
+            }
+        if error_code == 'not_found':
+            return {
+                'success': False,
+                'error': _('Product not found in Icecat database'),
+                'status': 'no_data'
+            }
+        if error_code == 'not_in_catalog':
+            return {
+                'success': False,
+                'error': _('Product is not in the Icecat catalog index'),
+                'status': 'no_data'
+            }
+        messages = {
+            'invalid_json': _('Invalid JSON response from Icecat API'),
+            'auth': _('Authentication failed. Please check your Icecat credentials.'),
+            'timeout': _('Icecat API request timed out'),
+            'connection': _('Failed to connect to Icecat API'),
+            'throttled': _('Icecat API rate limit exceeded, try again later'),
+            'circuit_open': _('Skipped: Icecat is unavailable (circuit breaker open)'),
+        }
+        return {
+            'success': False,
+            'error': messages.get(error_code) or fetch_result.get('error_detail') or _('Unknown error occurred'),
+        }
 
     @api.model
     def _make_api_request(self, ean_code):
@@ -62,104 +862,15 @@ class IcecatConnector(models.AbstractModel):
         Make a request to Icecat JSON API
         Based on: https://iceclog.com/manual-for-icecat-json-product-requests/
         """
-        username, password = self._get_api_credentials()
-        api_url = self._get_api_url()
-        
-        # Ensure EAN code is a string
-        ean_code = str(ean_code or '').strip()
-        
-        # Log the barcode we received
-        _logger.info(f"Received EAN code: '{ean_code}' (type: {type(ean_code).__name__})")
-        
-        # Ensure EAN code is not empty
-        if not ean_code:
-            _logger.error("EAN code is empty!")
-            return {'success': False, 'error': 'EAN code is empty'}
-        
-        # Construct the API endpoint for EAN lookup
-        # Format: https://live.icecat.biz/api?lang=EN&shopname=username&GTIN=EAN&content=
-        # Get language from context or use Dutch as default
-        lang_code = self.env.context.get('lang', 'nl_NL')
-        # Map Odoo language codes to Icecat language codes
-        icecat_lang = 'nl' if lang_code.startswith('nl') else 'en'
-        url = f"{api_url}?lang={icecat_lang}&shopname={username}&GTIN={ean_code}&content="
-        
-        _logger.info(f"Requesting Icecat data for EAN: {ean_code}")
-        
-        try:
-            # Basic authentication
-            auth_string = f"{username}:{password}"
-            auth_bytes = auth_string.encode('ascii')
-            auth_b64 = base64.b64encode(auth_bytes).decode('ascii')
-            
-            headers = {
-                'Authorization': f'Basic {auth_b64}',
-                'Accept': 'application/json',
-            }
-            
-            response = requests.get(url, headers=headers, timeout=30)
-            
-            # Log response status and URL
-            _logger.info(f"Icecat API URL: {url}")
-            _logger.info(f"Icecat API response status: {response.status_code}")
-            if response.status_code != 200:
-                _logger.error(f"Icecat API response body: {response.text[:500]}")
-            
-            if response.status_code == 200:
-                try:
-                    data = response.json()
-                    return {'success': True, 'data': data}
-                except ValueError as e:
-                    _logger.error(f"Failed to parse JSON response: {e}")
-                    return {
-                        'success': False,
-                        'error': _('Invalid JSON response from Icecat API')
-                    }
-            elif response.status_code == 404:
-                # Check if it's a brand restriction vs product not found
-                try:
-                    error_data = response.json()
-                    if 'brand restrictions' in error_data.get('Message', '').lower():
-                        return {
-                            'success': False,
-                            'error': _('Product has brand restrictions. This product requires Full Icecat subscription.'),
-                            'status': 'no_data'
-                        }
-                except:
-                    pass
-                return {
-                    'success': False,
-                    'error': _('Product not found in Icecat database'),
-                    'status': 'no_data'
-                }
-            elif response.status_code == 401:
-                return {
-                    'success': False,
-                    'error': _('Authentication failed. Please check your Icecat credentials.')
-                }
-            else:
-                error_msg = f"Icecat API error: {response.status_code}"
-                try:
-                    error_data = response.json()
-                    error_msg += f" - {error_data.get('message', '')}"
-                except:
-                    error_msg += f" - {response.text[:200]}"
-                
-                _logger.error(error_msg)
-                return {'success': False, 'error': error_msg}
-                
-        except requests.exceptions.Timeout:
-            error_msg = _('Icecat API request timed out')
-            _logger.error(error_msg)
-            return {'success': False, 'error': error_msg}
-        except requests.exceptions.ConnectionError:
-            error_msg = _('Failed to connect to Icecat API')
-            _logger.error(error_msg)
-            return {'success': False, 'error': error_msg}
-        except Exception as e:
-            error_msg = f"Unexpected error: {str(e)}"
-            _logger.exception(error_msg)
-            return {'success': False, 'error': error_msg}
+        config = self._load_sync_config()
+        self._check_credentials(config)
+        result = _request_icecat_json(config, ean_code)
+        if not result.get('success'):
+            return self._api_error_result(result)
+        data = _decode_json(result['raw'])
+        if data is None:
+            return self._api_error_result({'error_code': 'invalid_json'})
+        return dict(result, data=data)
 
     @api.model
     def _parse_product_data(self, icecat_data):
@@ -199,12 +910,13 @@ class IcecatConnector(models.AbstractModel):
                 'specifications': []
             }
             
-            # Extract images
+            # Extract images, keeping every rendition so the sync can pick a size
             gallery = data.get('Gallery', [])
             for image in gallery:
                 if image.get('Pic'):
                     product_info['images'].append({
                         'url': image.get('Pic'),
+                        'urls': {size: image.get(key) for size, key in IMAGE_SIZE_KEYS.items()},
                         'size': image.get('Size', 0),
                         'type': image.get('Type', 'product')
                     })
@@ -219,12 +931,16 @@ class IcecatConnector(models.AbstractModel):
                     feature_obj = feature.get('Feature', {})
                     spec_name = feature_obj.get('Name', {}).get('Value', '')
                     spec_value = feature.get('Value', '')
+                    measure = feature_obj.get('Measure') or {}
                     
                     if spec_name and spec_value:
                         product_info['specifications'].append({
                             'group': group_name,
                             'name': spec_name,
-                            'value': spec_value
+                            'value': spec_value,
+                            'feature_id': feature_obj.get('ID'),
+                            'unit': (measure.get('Signs') or {}).get('_') or measure.get('Sign') or '',
+                            'type': feature_obj.get('Type', ''),
                         })
             
             return product_info
@@ -234,17 +950,36 @@ class IcecatConnector(models.AbstractModel):
             return None
 
     @api.model
-    def _download_image(self, image_url):
-        """Download image from URL and return base64 encoded data"""
+    def _download_image(self, image_url, session=None, max_bytes=MAX_IMAGE_BYTES):
+        """
+        Stream an image from URL in chunks, hashing it on the way
+
+        Runs inside the fetch worker threads. Downloads larger than
+        ``max_bytes`` are aborted.
+
+        :return: dict with the raw ``data`` and its sha256 ``hash``, or None
+        """
         try:
-            response = requests.get(
+            with (session or requests).get(
                 image_url,
                 stream=True,
                 timeout=15,
-                headers={'User-Agent': 'Odoo/18.0 Icecat-Module'},
-            )
-            response.raise_for_status()
-            return base64.b64encode(response.content)
+                headers={'User-Agent': USER_AGENT},
+            ) as response:
+                response.raise_for_status()
+                content_length = response.headers.get('Content-Length')
+                if content_length and content_length.isdigit() and int(content_length) > max_bytes:
+                    _logger.warning("Image download overgeslagen %s: %s bytes is groter dan %s", image_url, content_length, max_bytes)
+                    return None
+                data = bytearray()
+                digest = hashlib.sha256()
+                for chunk in response.iter_content(chunk_size=IMAGE_CHUNK_SIZE):
+                    data.extend(chunk)
+                    if len(data) > max_bytes:
+                        _logger.warning("Image download afgebroken %s: groter dan %s bytes", image_url, max_bytes)
+                        return None
+                    digest.update(chunk)
+            return {'data': bytes(data), 'hash': digest.hexdigest()}
         except Exception as e:
             _logger.warning("Image download mislukt %s: %s", image_url, e)
             return None
@@ -258,80 +993,343 @@ class IcecatConnector(models.AbstractModel):
         """
         if not specifications:
             return
-        
-        attribute_obj = self.env['product.attribute']
-        value_obj = self.env['product.attribute.value']
-        template_attr_obj = self.env['product.template.attribute.line']
-        
-        _logger.info(f"Syncing {len(specifications)} specifications as attributes for product {product.name}")
-        
-        # Remove only Icecat-managed attributes (preserve manual ones)
-        icecat_lines = product.attribute_line_ids.filtered(
-            lambda l: l.attribute_id.name.startswith('[Icecat]')
-        )
-        if icecat_lines:
-            icecat_lines.unlink()
-        
-        # Group specifications by category for cleaner attribute structure
-        grouped_specs = {}
-        for spec in specifications:
-            group = spec.get('group') or 'Algemeen'
-            if group not in grouped_specs:
-                grouped_specs[group] = []
-            grouped_specs[group].append(spec)
-        
-        # Create attributes per group (enables automatic backend grouping)
-        for group_name, specs in grouped_specs.items():
-            # Attribute name: [Icecat] Group → auto-groups in backend
-            attr_name = f"[Icecat] {group_name}"
-            
-            # Find or create the group attribute
-            attribute = attribute_obj.search([('name', '=', attr_name)], limit=1)
-            if not attribute:
-                attribute = attribute_obj.create({
-                    'name': attr_name,
-                    'display_type': 'select',
-                    'create_variant': 'no_variant',  # Don't create product variants
-                })
-            
-            # Collect all values for this group
-            values_to_create = []
-            for spec in specs:
-                spec_name = spec.get('name')
-                spec_value = str(spec.get('value', ''))
-                
-                if not spec_name or not spec_value:
+        self._sync_batch_attributes(product, {product.id: specifications})
+
+    @api.model
+    def _sync_batch_attributes(self, products, specifications, resolver=None):
+        """
+        Sync the specifications of a whole batch as [Icecat] attributes
+
+        Attributes and values are resolved through an in-memory index (see
+        ``IcecatAttributeResolver``). The attribute lines are then diffed
+        against the desired state: only missing lines are created, only changed
+        lines get their values added/removed and only obsolete [Icecat] lines
+        are removed. An unchanged product gets no write at all.
+
+        :param products: product.template recordset
+        :param specifications: dict mapping product id to its specifications
+        :param resolver: the run's IcecatAttributeResolver, built when omitted
+        """
+        if not specifications:
+            return
+        resolver = resolver or IcecatAttributeResolver(self.env)
+
+        _logger.info(f"Syncing specifications as attributes for {len(specifications)} products")
+        desired_lines = resolver.resolve(specifications)
+        products = products.filtered(lambda p: p.id in desired_lines)
+
+        lines_to_create = []
+        lines_to_remove = self.env['product.template.attribute.line']
+        for product in products:
+            desired = {
+                attribute_id: value_ids
+                for attribute_id, value_ids in desired_lines[product.id].items()
+                if value_ids
+            }
+            # Only Icecat-managed attributes (preserve manual ones)
+            current = {
+                line.attribute_id.id: line
+                for line in product.attribute_line_ids
+                if line.attribute_id.name.startswith(ICECAT_ATTRIBUTE_PREFIX)
+            }
+
+            for attribute_id, line in current.items():
+                if attribute_id not in desired:
+                    lines_to_remove |= line
                     continue
-                
-                # Value format: "Spec Name: Value"
-                value_name = f"{spec_name}: {spec_value}"
-                
-                # Find or create the attribute value
-                value = value_obj.search([
-                    ('attribute_id', '=', attribute.id),
-                    ('name', '=', value_name)
-                ], limit=1)
-                
-                if not value:
-                    value = value_obj.create({
-                        'attribute_id': attribute.id,
-                        'name': value_name,
-                    })
-                
-                values_to_create.append(value.id)
-            
-            # Create attribute line with all values for this group
-            if values_to_create:
-                existing_line = product.attribute_line_ids.filtered(
-                    lambda l: l.attribute_id.id == attribute.id
-                )
-                if not existing_line:
-                    template_attr_obj.create({
-                        'product_tmpl_id': product.id,
-                        'attribute_id': attribute.id,
-                        'value_ids': [(6, 0, values_to_create)]
-                    })
+                current_ids = set(line.value_ids.ids)
+                desired_ids = set(desired[attribute_id])
+                if current_ids != desired_ids:
+                    line.write({'value_ids': (
+                        [(4, value_id) for value_id in desired_ids - current_ids]
+                        + [(3, value_id) for value_id in current_ids - desired_ids]
+                    )})
+
+            lines_to_create += [
+                {
+                    'product_tmpl_id': product.id,
+                    'attribute_id': attribute_id,
+                    'value_ids': [(6, 0, value_ids)],
+                }
+                for attribute_id, value_ids in desired.items()
+                if attribute_id not in current
+            ]
+
+        if lines_to_remove:
+            lines_to_remove.unlink()
+        if lines_to_create:
+            self.env['product.template.attribute.line'].create(lines_to_create)
+
+    @api.model
+    def _fetch_product_info(self, config, barcode, fingerprint=None, validators=None):
+        """
+        Fetch stage for one barcode: API request and JSON parsing.
+
+        Runs inside the fetch worker threads and therefore must not touch
+        ``self.env``; everything it needs comes from ``config``.
+
+        :param fingerprint: sync fingerprint stored on the product; when the
+            response still matches it, parsing and images are skipped
+        :param validators: cached ETag/Last-Modified for a conditional request
+        """
+        try:
+            breaker = config.circuit_breaker
+            if breaker and not breaker.allow():
+                return {'success': False, 'error_code': 'circuit_open'}
+            result = {'success': False, 'error_code': 'unexpected'}
+            try:
+                result = _request_icecat_json(config, barcode, validators)
+            finally:
+                if breaker:
+                    breaker.record(result)
+            if not result.get('success'):
+                return dict(result, barcode=barcode)
+
+            if result.get('not_modified'):
+                # 304: the cached payload the product was synced from is still current
+                return {
+                    'success': True,
+                    'not_modified': True,
+                    'unchanged': True,
+                    'barcode': barcode,
+                    'fingerprint': fingerprint,
+                }
+
+            fetched = {
+                'success': True,
+                'barcode': barcode,
+                'raw': result['raw'],
+                'content_hash': result['content_hash'],
+                'etag': result.get('etag'),
+                'last_modified': result.get('last_modified'),
+                'fingerprint': _sync_fingerprint(result['content_hash'], config),
+            }
+            if fingerprint and fetched['fingerprint'] == fingerprint:
+                fetched['unchanged'] = True
+                return fetched
+
+            data = _decode_json(result['raw'])
+            if data is None:
+                return {'success': False, 'error_code': 'invalid_json'}
+
+            product_info = self._parse_product_data(data)
+            if product_info:
+                # Pick the configured rendition: main image vs. extra gallery images
+                for idx, image_info in enumerate(product_info['images']):
+                    size = config.main_image_size if idx == 0 else config.gallery_image_size
+                    image_info['url'] = _select_image_url(image_info, size)
+            fetched['product_info'] = product_info
+            return fetched
+        except Exception as e:
+            error_msg = f"Unexpected error: {str(e)}"
+            _logger.exception(error_msg)
+            return {'success': False, 'error_code': 'unexpected', 'error_detail': error_msg}
+
+    @api.model
+    def _fetch_batch(self, config, fetch_args):
+        """
+        Run the fetch stage for a batch in a bounded thread pool
+
+        Products sharing a GTIN are fetched and parsed once; the result is
+        fanned out to every product of the group. Images are downloaded later,
+        per apply sub-batch (see ``_sync_batch``).
+
+        :param fetch_args: dict mapping product id to the keyword arguments
+            for ``_fetch_product_info`` (see ``_prepare_fetch_args``)
+        :return: dict mapping product id to the fetch result
+        """
+        product_ids_by_gtin = defaultdict(list)
+        for product_id, kwargs in fetch_args.items():
+            product_ids_by_gtin[kwargs['barcode']].append(product_id)
+
+        gtin_args = {
+            gtin: self._merge_fetch_args([fetch_args[product_id] for product_id in product_ids])
+            for gtin, product_ids in product_ids_by_gtin.items()
+        }
+        gtin_results = self._run_in_pool(config, self._fetch_product_info, {
+            gtin: (config,) for gtin in gtin_args
+        }, gtin_args)
+
+        fetch_results = {}
+        for gtin, product_ids in product_ids_by_gtin.items():
+            result = gtin_results[gtin]
+            for product_id in product_ids:
+                # Own copy per product: the image stage adds product specific downloads
+                fetch_results[product_id] = product_result = dict(result)
+                fingerprint = fetch_args[product_id].get('fingerprint')
+                if result.get('success') and fingerprint and result.get('fingerprint') == fingerprint:
+                    product_result['unchanged'] = True
+        return fetch_results
+
+    @api.model
+    def _merge_fetch_args(self, product_args):
+        """
+        Fetch arguments for one GTIN shared by several products
+
+        The fingerprint short cut and the conditional request are only used
+        when every product of the group holds the same synced data.
+        """
+        merged = {'barcode': product_args[0]['barcode']}
+        fingerprints = {kwargs.get('fingerprint') for kwargs in product_args}
+        if len(fingerprints) == 1 and None not in fingerprints:
+            merged['fingerprint'] = fingerprints.pop()
+            if all(kwargs.get('validators') for kwargs in product_args):
+                merged['validators'] = product_args[0]['validators']
+        return merged
+
+    @api.model
+    def _run_in_pool(self, config, func, args, kwargs=None):
+        """
+        Call ``func`` once per key in the bounded fetch thread pool
+
+        :param args: dict mapping a key to the positional arguments of the call
+        :param kwargs: optional dict mapping a key to the keyword arguments
+        :return: dict mapping each key to the return value of its call
+        """
+        kwargs = kwargs or {}
+        workers = max(1, min(config.fetch_workers, len(args)))
+        if workers == 1:
+            return {key: func(*call_args, **kwargs.get(key, {})) for key, call_args in args.items()}
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='icecat-fetch') as executor:
+            futures = {
+                key: executor.submit(func, *call_args, **kwargs.get(key, {}))
+                for key, call_args in args.items()
+            }
+        return {key: future.result() for key, future in futures.items()}
+
+    @api.model
+    def _fetch_batch_images(self, config, fetch_results, known_image_urls):
+        """
+        Image stage of the fetch: download the new gallery images of a batch
+
+        Every URL is downloaded once per call, concurrently, and only when at
+        least one product does not hold it yet. The downloads are stored as
+        ``images`` (URL -> data and sha256) on the fetch results.
+        """
+        wanted = {}
+        for product_id, result in fetch_results.items():
+            product_info = result.get('product_info')
+            if not result.get('success') or not product_info:
+                continue
+            known_urls = known_image_urls.get(product_id, ())
+            result['images'] = {}
+            for image_info in product_info.get('images', []):
+                url = image_info.get('url') or image_info.get('pic')
+                if url and url not in known_urls:
+                    wanted.setdefault(url, []).append(result)
+
+        if not wanted:
+            return
+
+        downloads = self._run_in_pool(config, self._download_image, {
+            url: (url, config.session, config.image_max_bytes) for url in wanted
+        })
+        for url, results in wanted.items():
+            if downloads[url]:
+                for result in results:
+                    result['images'][url] = downloads[url]
+
+    @api.model
+    def _get_known_image_urls(self, products):
+        """Icecat image URLs each product already holds, so they are not downloaded again"""
+        known_image_urls = defaultdict(set)
+        for image in self.env['product.image'].search_read([
+            ('product_tmpl_id', 'in', products.ids),
+            ('icecat_url', '!=', False),
+        ], ['product_tmpl_id', 'icecat_url']):
+            known_image_urls[image['product_tmpl_id'][0]].add(image['icecat_url'])
+        for product in products.with_context(bin_size=True).filtered(lambda p: p.icecat_image_url and p.image_1920):
+            known_image_urls[product.id].add(product.icecat_image_url)
+        return known_image_urls
+
+    @api.model
+    def _prepare_fetch_args(self, config, products, barcodes):
+        """
+        Build the fetch stage arguments of a batch from what we already hold
+
+        Products still in sync with the cached response of their GTIN get the
+        cached HTTP validators, so Icecat can answer with a 304.
+        """
+        fetch_args = {}
+        synced = products.filtered(lambda p: p.icecat_sync_status == 'synced' and p.icecat_sync_fingerprint)
+        cache_entries = {
+            entry.gtin: entry
+            for entry in self.env['icecat.response.cache'].sudo().search([
+                ('gtin', 'in', [barcodes[product.id] for product in synced]),
+                ('lang', '=', config.lang),
+            ])
+        } if synced else {}
+
+        for product in products:
+            kwargs = {'barcode': barcodes[product.id]}
+            if product in synced:
+                kwargs['fingerprint'] = product.icecat_sync_fingerprint
+                entry = cache_entries.get(kwargs['barcode'])
+                if (entry and (entry.etag or entry.last_modified)
+                        and _sync_fingerprint(entry.content_hash, config) == product.icecat_sync_fingerprint):
+                    kwargs['validators'] = {
+                        'etag': entry.etag,
+                        'last_modified': entry.last_modified,
+                        'content_hash': entry.content_hash,
+                    }
+            fetch_args[product.id] = kwargs
+        return fetch_args
+
+    @api.model
+    def _report_http_stats(self, before, after, log=None):
+        """Log connection reuse and throttling of a batch, from two ``_http_stats``"""
+        request_count = after['requests'] - before['requests']
+        reused_count = max(request_count - (after['connections'] - before['connections']), 0)
+        throttled_count = after.get('throttled', 0) - before.get('throttled', 0)
+        retry_count = after.get('retries', 0) - before.get('retries', 0)
+        wait_time = after.get('wait', 0.0) - before.get('wait', 0.0)
+        _logger.info(
+            "Icecat HTTP: %s requests, %s over a reused connection, %s throttled, %s retried, %.1fs rate limited",
+            request_count, reused_count, throttled_count, retry_count, wait_time,
+        )
+        if log:
+            log._add_counters({
+                'http_request_count': request_count,
+                'http_connection_reused_count': reused_count,
+                'http_throttled_count': throttled_count,
+                'http_retry_count': retry_count,
+                'rate_limit_wait': wait_time,
+            })
+
+    @api.model
+    def sync_products(self, products, log=None, run_cache=None, config=None):
+        """
+        Sync a batch of products with Icecat
+
+        The HTTP requests, parsing and image downloads of the whole batch run
+        concurrently (see ``fetch_workers`` in the settings); the ORM writes are
+        done afterwards, one product at a time, in the calling thread.
+
+        :param products: product.template recordset
+        :param log: optional icecat.sync.log record receiving the batch counters
+        :param run_cache: optional dict shared by the batches of one run, see
+            ``_sync_batch``
+        :param config: IcecatSyncConfig to use, loaded when omitted
+        :return: dict mapping product id to the sync result of that product
+        """
+        results = {}
+        barcodes = {}
+        for product in products:
+            if product.icecat_gtin:
+                barcodes[product.id] = product.icecat_gtin
+            else:
+                results[product.id] = {
+                    'success': False,
+                    'error': _('Product has no valid barcode (EAN/GTIN)')
+                }
 
+        if barcodes:
+            results.update(self._sync_batch(
+                products.filtered(lambda p: p.id in barcodes), barcodes,
+                log=log, run_cache=run_cache, config=config,
+            ))
+        return results
 
     @api.model
     def sync_product(self, product, barcode=None):
@@ -339,43 +1337,396 @@ class IcecatConnector(models.AbstractModel):
         Main method to sync a single product with Icecat
         
         :param product: product.template record
-        :param barcode: EAN/GTIN code to use (optional, will be retrieved from variants if not provided)
+        :param barcode: EAN/GTIN code to use (optional, the product's ``icecat_gtin`` if not provided)
         :return: dict with success status and message
         """
         # Get barcode from parameter or from product variants
         if not barcode:
-            barcode = product.product_variant_ids.filtered(lambda v: v.barcode)[:1].barcode
+            barcode = product.icecat_gtin
         
         if not barcode:
             return {
                 'success': False,
-                'error': _('Product has no barcode (EAN/GTIN)')
+                'error': _('Product has no valid barcode (EAN/GTIN)')
             }
-        
-        # Mark as pending
-        product.write({'icecat_sync_status': 'pending'})
-        
-        # Make API request
-        api_result = self._make_api_request(barcode)
-        
-        if not api_result.get('success'):
+
+        gtin = normalize_gtin(barcode)
+        if not gtin:
+            return {
+                'success': False,
+                'error': _('Barcode %s is not a valid EAN/GTIN (check digit)') % barcode
+            }
+        barcode = gtin
+
+        return self._sync_batch(product, {product.id: barcode})[product.id]
+
+    @api.model
+    def _sync_batch(self, products, barcodes, log=None, run_cache=None, config=None):
+        """
+        Fetch stage for the whole batch, then the ORM stage product by product
+
+        Attribute lines are written for the whole batch at the end.
+
+        :param products: product.template recordset, all present in ``barcodes``
+        :param barcodes: dict mapping product id to the normalized GTIN to request
+        :param log: optional icecat.sync.log record receiving the batch counters
+        :param run_cache: optional dict holding per-run indexes (such as the
+            attribute resolver) that are shared by all batches of a run
+        :param config: IcecatSyncConfig to use, loaded when omitted
+        :return: dict mapping product id to the sync result of that product
+        """
+        run_cache = {} if run_cache is None else run_cache
+        results = {}
+        config = config or self._load_sync_config()
+        self._check_credentials(config)
+        fetch_args = self._prepare_fetch_args(config, products, barcodes)
+
+        # GTINs Icecat recently said it does not know are not requested again
+        NegativeCache = self.env['icecat.negative.cache'].sudo()
+        negative_hits = NegativeCache._lookup(config, {
+            product_id: kwargs['barcode'] for product_id, kwargs in fetch_args.items()
+        })
+        for product_id in negative_hits:
+            del fetch_args[product_id]
+
+        # Definitely not in the Icecat catalog: no_data without an API call.
+        # Synced products are always requested, Icecat evidently knows them
+        catalog_misses = {}
+        if config.gtin_set is not None:
+            synced_ids = set(products.filtered(lambda p: p.icecat_sync_status == 'synced').ids)
+            catalog_misses = {
+                product_id: kwargs['barcode'] for product_id, kwargs in fetch_args.items()
+                if product_id not in synced_ids and kwargs['barcode'] not in config.gtin_set
+            }
+            for product_id in catalog_misses:
+                del fetch_args[product_id]
+
+        http_stats = _http_stats(config)
+        fetch_results = self._fetch_batch(config, fetch_args)
+        self._report_http_stats(http_stats, _http_stats(config), log)
+        self._save_circuit_state(config.circuit_breaker)
+        fetch_results.update({
+            product_id: {
+                'success': False,
+                'error_code': reason,
+                'barcode': barcodes[product_id],
+                'negative_cached': True,
+            }
+            for product_id, reason in negative_hits.items()
+        })
+        fetch_results.update({
+            product_id: {'success': False, 'error_code': 'not_in_catalog', 'barcode': barcode}
+            for product_id, barcode in catalog_misses.items()
+        })
+
+        self.env['icecat.response.cache'].sudo()._store_responses(
+            config.lang, fetch_results.values()
+        )
+        NegativeCache._store_results(config, fetch_results.values())
+
+        touched_ids = []
+        known_image_urls = self._get_known_image_urls(products) if config.sync_images else {}
+        # Images are downloaded and applied per sub-batch, so only a few products' images
+        # are in memory at once; products of one GTIN stay together to share their downloads
+        ordered = products.sorted(lambda p: barcodes[p.id])
+        for offset in range(0, len(ordered), IMAGE_APPLY_BATCH_SIZE):
+            sub_batch = ordered[offset:offset + IMAGE_APPLY_BATCH_SIZE]
+            if config.sync_images:
+                self._fetch_batch_images(
+                    config, {product.id: fetch_results[product.id] for product in sub_batch}, known_image_urls
+                )
+            for product in sub_batch:
+                try:
+                    with self.env.cr.savepoint():
+                        results[product.id] = self._apply_product_info(
+                            product, fetch_results[product.id], config,
+                            run_cache=run_cache, touched_ids=touched_ids,
+                        )
+                except Exception as e:
+                    # Rolled back records may be referenced by the run's category cache
+                    run_cache.pop('categories', None)
+                    _logger.exception(f"Failed to apply Icecat data to product {product.id}")
+                    product.write({
+                        'icecat_sync_status': 'error',
+                        'icecat_error_message': str(e),
+                    })
+                    results[product.id] = {'success': False, 'error': str(e)}
+                fetch_results[product.id].pop('images', None)
+
+        self._touch_last_sync(touched_ids)
+        self._store_batch_specifications(results)
+        if any(result.get('success') and not result.get('unchanged') for result in results.values()):
+            # New specifications are rendered to HTML by a background step
+            self.env['product.template']._trigger_specs_render()
+
+        if config.sync_attributes:
+            self._sync_batch_results_attributes(products, results, run_cache)
+
+        if log:
+            log._add_counters({
+                'unchanged_count': sum(1 for result in results.values() if result.get('unchanged')),
+                'negative_cache_hit_count': len(negative_hits),
+                'catalog_miss_count': len(catalog_misses),
+                'http_200_count': len({
+                    result['barcode'] for result in fetch_results.values()
+                    if result.get('success') and not result.get('not_modified')
+                }),
+                'http_304_count': len({
+                    result['barcode'] for result in fetch_results.values() if result.get('not_modified')
+                }),
+                'skipped_count': sum(1 for result in results.values() if result.get('skipped')),
+            })
+        return results
+
+    @api.model
+    def _apply_product_images(self, product, images, fetch_result):
+        """
+        Write the gallery to the product, skipping every unchanged image
+
+        Images are fingerprinted by URL (known URLs are not even downloaded) and
+        by content hash, so an identical image is never written again and Odoo
+        does not regenerate its resized variants.
+
+        :return: tuple of the values for the main image to merge into the
+            product write, and whether every image could be applied (False
+            when a download failed)
+        """
+        vals = {}
+        complete = True
+        downloads = fetch_result.get('images', {})
+
+        # Eerst bestaande Icecat-afbeeldingen ophalen (op basis van icecat_url)
+        existing_images = self.env['product.image'].search([
+            ('product_tmpl_id', '=', product.id),
+            ('icecat_url', '!=', False)
+        ])
+        existing_urls = {img.icecat_url: img for img in existing_images}
+        existing_hashes = {img.icecat_image_hash: img for img in existing_images if img.icecat_image_hash}
+        current_images = self.env['product.image']
+
+        for idx, image_info in enumerate(images):
+            url = image_info.get('url') or image_info.get('pic')
+            if not url:
+                continue
+
+            if idx == 0:
+                # Hoofdafbeelding: alleen schrijven als de inhoud echt anders is
+                download = downloads.get(url)
+                if not download:
+                    # Not downloaded because the product already holds it, or the download failed
+                    if url != product.icecat_image_url or not product.with_context(bin_size=True).image_1920:
+                        complete = False
+                    continue
+                if (download['hash'] != product.icecat_image_hash
+                        or not product.with_context(bin_size=True).image_1920):
+                    vals['image_1920'] = base64.b64encode(download['data'])
+                    vals['icecat_image_hash'] = download['hash']
+                if url != product.icecat_image_url:
+                    vals['icecat_image_url'] = url
+            elif url in existing_urls:
+                # Bestaat al: hooguit de volgorde bijwerken
+                current_images |= existing_urls[url]
+                if existing_urls[url].sequence != idx:
+                    existing_urls[url].write({'sequence': idx})
+            else:
+                download = downloads.get(url)
+                if not download:
+                    complete = False
+                    continue
+                same_image = existing_hashes.get(download['hash'])
+                if same_image and same_image not in current_images:
+                    # Zelfde afbeelding onder een nieuwe URL: geen nieuwe image write
+                    same_image.write({'icecat_url': url, 'sequence': idx})
+                    current_images |= same_image
+                    continue
+                current_images |= self.env['product.image'].create({
+                    'product_tmpl_id': product.id,
+                    'image_1920': base64.b64encode(download['data']),
+                    'name': image_info.get('title', f"Icecat Image {idx + 1}"),
+                    'icecat_url': url,
+                    'icecat_image_hash': download['hash'],
+                    'sequence': idx,
+                })
+
+        if complete:
+            # Icecat-afbeeldingen die niet meer in de galerij staan (of een andere
+            # rendition na een wijziging van de afbeeldingsgrootte) opruimen
+            (existing_images - current_images).unlink()
+        return vals, complete
+
+    @api.model
+    def _store_batch_specifications(self, results):
+        """Refresh the normalized spec store of every product that got new Icecat data"""
+        specifications = {
+            product_id: result['product_info'].get('specifications') or []
+            for product_id, result in results.items()
+            if result.get('success') and result.get('product_info')
+        }
+        try:
+            with self.env.cr.savepoint():
+                self.env['icecat.spec.value'].sudo()._store_specifications(specifications)
+                self.env['icecat.facet.count'].sudo()._mark_products_dirty(
+                    self.env['product.template'].browse(list(specifications))
+                )
+        except Exception:
+            _logger.exception("Failed to store the Icecat specifications of the batch")
+            self._clear_sync_fingerprints(list(specifications))
+
+    @api.model
+    def _clear_sync_fingerprints(self, product_ids):
+        """
+        Forget the sync fingerprint of partially applied products, so the
+        next run applies their payload again instead of skipping it as unchanged
+        """
+        if product_ids:
+            self.env['product.template'].browse(product_ids).write({'icecat_sync_fingerprint': False})
+
+    @api.model
+    def _sync_batch_results_attributes(self, products, results, run_cache):
+        """Write the attribute lines of every product that got new Icecat data"""
+        specifications = {
+            product_id: result['product_info']['specifications']
+            for product_id, result in results.items()
+            if result.get('success') and result.get('product_info', {}).get('specifications')
+        }
+        if not specifications:
+            return
+
+        if 'attribute_resolver' not in run_cache:
+            run_cache['attribute_resolver'] = IcecatAttributeResolver(self.env)
+        try:
+            with self.env.cr.savepoint():
+                self._sync_batch_attributes(products, specifications, run_cache['attribute_resolver'])
+        except Exception:
+            # The index may now point to rolled back records
+            run_cache.pop('attribute_resolver', None)
+            _logger.exception("Failed to sync Icecat attributes for the batch")
+            self._clear_sync_fingerprints(list(specifications))
+
+    @api.model
+    def _changed_values(self, product, vals):
+        """
+        Keep only the values that differ from what the product already holds
+
+        Values are compared in their cache format, so x2many commands, html
+        sanitizing and record/id differences do not count as changes. Binary
+        fields are kept as-is: callers only pass images that changed.
+        """
+        changed = {}
+        for field_name, value in vals.items():
+            field = product._fields[field_name]
+            if field.type == 'binary':
+                changed[field_name] = value
+                continue
+            new_value = field.convert_to_cache(value, product)
+            old_value = field.convert_to_cache(product[field_name], product)
+            if new_value != old_value:
+                changed[field_name] = value
+        return changed
+
+    @api.model
+    def _write_product_vals(self, product, vals, touched_ids=None):
+        """
+        Single, change-only write of the sync result to the product
+
+        ``icecat_last_sync`` alone is not a change: when nothing else differs
+        the product is not written at all and its id is collected in
+        ``touched_ids`` for ``_touch_last_sync`` (or touched right away).
+
+        :return: True when the product was written
+        """
+        vals = dict(vals)
+        last_sync = vals.pop('icecat_last_sync', None)
+        changed = self._changed_values(product, vals)
+        if changed:
+            if last_sync:
+                changed['icecat_last_sync'] = last_sync
+            product.write(changed)
+            return True
+
+        if last_sync:
+            if touched_ids is None:
+                self._touch_last_sync(product.ids, last_sync)
+            else:
+                touched_ids.append(product.id)
+        return False
+
+    @api.model
+    def _touch_last_sync(self, product_ids, sync_time=None):
+        """
+        Bump ``icecat_last_sync`` of unchanged products with one UPDATE
+
+        Bypasses the ORM write on purpose: no field triggers, recomputes or
+        ``write_date`` bump for products whose data did not change.
+        """
+        if not product_ids:
+            return
+        ProductTemplate = self.env['product.template']
+        ProductTemplate.flush_model(['icecat_last_sync'])
+        self.env.cr.execute(
+            "UPDATE product_template SET icecat_last_sync = %s WHERE id IN %s",
+            (sync_time or fields.Datetime.now(), tuple(product_ids)),
+        )
+        ProductTemplate.browse(product_ids).invalidate_recordset(['icecat_last_sync'])
+
+    @api.model
+    def _apply_product_info(self, product, fetch_result, config, run_cache=None, touched_ids=None):
+        """
+        Write the result of the fetch stage to the product (ORM stage)
+
+        Everything ends up in one values dict that is written once, and only
+        with the fields that actually changed (see ``_write_product_vals``).
+
+        :param product: product.template record
+        :param fetch_result: dict returned by ``_fetch_product_info``
+        :param config: IcecatSyncConfig of the batch
+        :param run_cache: optional per-run dict, see ``_sync_batch``
+        :param touched_ids: optional list collecting unchanged product ids
+        :return: dict with success status and message
+        """
+        now = fields.Datetime.now()
+
+        breaker = config.circuit_breaker
+        if fetch_result.get('error_code') == 'circuit_open' or (
+            breaker and breaker.is_open and _is_systemic_failure(fetch_result)
+        ):
+            # Icecat is down or refuses our account: not the product's fault,
+            # so its status is left alone and it is simply tried again later.
+            # A single timeout or 5xx without an open breaker is a product error
+            # below, otherwise a GTIN Icecat always fails on is requeued forever
+            return dict(self._api_error_result(fetch_result), skipped=True)
+
+        if not fetch_result.get('success'):
+            api_result = self._api_error_result(fetch_result)
             # Update product with error status
-            product.write({
+            self._write_product_vals(product, {
                 'icecat_sync_status': api_result.get('status', 'error'),
                 'icecat_error_message': api_result.get('error', ''),
-                'icecat_last_sync': fields.Datetime.now(),
-            })
+                'icecat_last_sync': now,
+            }, touched_ids)
             return api_result
         
-        # Parse the data
-        product_info = self._parse_product_data(api_result['data'])
+        if fetch_result.get('unchanged'):
+            # Same payload and options as the last successful sync: nothing to apply
+            self._write_product_vals(product, {
+                'icecat_sync_status': 'synced',
+                'icecat_last_sync': now,
+                'icecat_error_message': False,
+            }, touched_ids)
+            return {
+                'success': True,
+                'unchanged': True,
+                'message': _('Icecat data unchanged since the last sync'),
+            }
+
+        product_info = fetch_result.get('product_info')
         
         if not product_info:
-            product.write({
+            self._write_product_vals(product, {
                 'icecat_sync_status': 'error',
                 'icecat_error_message': _('Failed to parse Icecat data'),
-                'icecat_last_sync': fields.Datetime.now(),
-            })
+                'icecat_last_sync': now,
+            }, touched_ids)
             return {
                 'success': False,
                 'error': _('Failed to parse Icecat data')
@@ -384,10 +1735,11 @@ class IcecatConnector(models.AbstractModel):
         # Update product with Icecat data
         update_vals = {
             'icecat_sync_status': 'synced',
-            'icecat_last_sync': fields.Datetime.now(),
+            'icecat_last_sync': now,
             'icecat_brand': product_info.get('brand'),
             'icecat_category': product_info.get('category'),
             'icecat_error_message': False,
+            'icecat_sync_fingerprint': fetch_result.get('fingerprint'),
         }
         
         # Update name if empty
@@ -402,71 +1754,42 @@ class IcecatConnector(models.AbstractModel):
             update_vals['description_ecommerce'] = product_info['description_short']
         
         # Update description_sale if configured
-        if self._get_config_param('sync_description', 'True') == 'True':
+        if config.sync_description:
             if product_info.get('description_long'):
                 update_vals['description_sale'] = product_info['description_long']
             elif product_info.get('description_short'):
                 update_vals['description_sale'] = product_info['description_short']
         
         # Update images if configured
-        if self._get_config_param('sync_images', 'True') == 'True':
+        if config.sync_images:
             if product_info.get('images'):
-                # Eerst bestaande Icecat-afbeeldingen ophalen (op basis van icecat_url)
-                existing_images = self.env['product.image'].search([
-                    ('product_tmpl_id', '=', product.id),
-                    ('icecat_url', '!=', False)
-                ])
-                existing_urls = {img.icecat_url: img for img in existing_images}
-
-                image_count = 0
-                for idx, image_info in enumerate(product_info['images']):
-                    url = image_info.get('url') or image_info.get('pic')
-                    if not url:
-                        continue
-
-                    image_data = self._download_image(url)
-                    if not image_data:
-                        continue
-
-                    if idx == 0:
-                        # Hoofdafbeelding altijd overschrijven
-                        update_vals['image_1920'] = image_data
-                        image_count += 1
-                    else:
-                        # Extra afbeeldingen: alleen toevoegen als nog niet bestaat
-                        if url not in existing_urls:
-                            self.env['product.image'].create({
-                                'product_tmpl_id': product.id,
-                                'image_1920': image_data,
-                                'name': image_info.get('title', f"Icecat Image {idx + 1}"),
-                                'icecat_url': url,
-                                'sequence': idx,
-                            })
-                            image_count += 1
-                        else:
-                            # Optioneel: sequence updaten als de volgorde anders is
-                            existing_urls[url].write({'sequence': idx})
-        
-        # Write updates to product
-        product.write(update_vals)
+                image_vals, images_complete = self._apply_product_images(
+                    product, product_info['images'], fetch_result
+                )
+                update_vals.update(image_vals)
+                if not images_complete:
+                    # No fingerprint: the next run applies the payload again and retries the images
+                    update_vals['icecat_sync_fingerprint'] = False
         
         # Always store raw specifications for grouped display
         if product_info.get('specifications'):
-            product.write({'icecat_specifications_raw': product_info['specifications']})
-        
-        # Sync specifications as product attributes if configured
-        if self._get_config_param('sync_attributes', 'False') == 'True':
-            if product_info.get('specifications'):
-                self._sync_product_attributes(product, product_info['specifications'])
+            update_vals['icecat_specifications_raw'] = product_info['specifications']
         
         # Apply category mapping if we have an Icecat category
         if product_info.get('category'):
+            category_cache = None
+            if run_cache is not None:
+                category_cache = run_cache.setdefault('categories', IcecatCategoryCache())
             category_mapping = self.env['icecat.category.mapping'].apply_mapping(
                 product, 
-                product_info['category']
+                product_info['category'],
+                cache=category_cache,
             )
             if category_mapping:
-                product.write(category_mapping)
+                update_vals.update(category_mapping)
+        
+        # Write updates to product, once and only what changed
+        self._write_product_vals(product, update_vals, touched_ids)
         
         _logger.info(f"Successfully synced product {product.id} with Icecat")
         
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+
+import logging
+
+from odoo import api, fields, models
+
+_logger = logging.getLogger(__name__)
+
+# Dirty categories recomputed per cron run
+FACET_REFRESH_BATCH_SIZE = 50
+# Most frequent values shown per facet (selected values are always shown)
+FACET_VALUE_LIMIT = 20
+
+
+class IcecatFacetCount(models.Model):
+    """
+    Precomputed inverted index: public category -> filterable feature value
+    -> number of visible products (the category and its children)
+
+    Category pages read their facets here with one indexed query, instead of
+    counting spec values over all their products on every request.
+    """
+    _name = 'icecat.facet.count'
+    _description = 'Icecat Facet Count'
+    _rec_name = 'value'
+    _order = 'category_id, feature_id, product_count desc, value'
+    _log_access = False
+
+    category_id = fields.Many2one('product.public.category', string='Category', required=True, ondelete='cascade')
+    feature_id = fields.Many2one('icecat.spec.feature', string='Feature', required=True, ondelete='cascade')
+    value = fields.Char(string='Value', required=True)
+    product_count = fields.Integer(string='Products')
+
+    _sql_constraints = [
+        ('category_feature_value_unique', 'unique(category_id, feature_id, value)',
+         'This facet value is already counted for this category!'),
+    ]
+
+    @api.model
+    def _trigger_refresh(self):
+        cron = self.env.ref('icecat_product_enrichment.ir_cron_refresh_facet_counts', raise_if_not_found=False)
+        if cron:
+            cron._trigger()
+
+    @api.model
+    def _mark_dirty(self, categories):
+        """Flag categories and all their parents for a refresh and wake the refresh cron"""
+        category_ids = {
+            int(category_id)
+            for category in categories
+            for category_id in (category.parent_path or '').split('/') if category_id
+        }
+        if not category_ids:
+            return
+        # Plain UPDATE: a category write would needlessly reset the mapping caches
+        Category = self.env['product.public.category']
+        Category.flush_model(['icecat_facets_dirty'])
+        self.env.cr.execute("""
+            UPDATE product_public_category SET icecat_facets_dirty = true
+             WHERE id IN %s AND icecat_facets_dirty IS NOT TRUE
+        """, (tuple(category_ids),))
+        Category.browse(category_ids).invalidate_recordset(['icecat_facets_dirty'])
+        self._trigger_refresh()
+
+    @api.model
+    def _mark_products_dirty(self, products):
+        """Flag the categories of products whose facet contribution may have changed"""
+        self._mark_dirty(products.sudo().with_context(active_test=False).public_categ_ids)
+
+    @api.model
+    def _refresh_categories(self, categories):
+        """Recount the facets of ``categories`` with one DELETE and one INSERT ... SELECT"""
+        if not categories:
+            return
+        categ_field = self.env['product.template']._fields['public_categ_ids']
+        self.env['product.template'].flush_model(['active', 'is_published', 'sale_ok', 'public_categ_ids'])
+        self.env['product.public.category'].flush_model(['parent_path'])
+        self.env['icecat.spec.feature'].flush_model(['filterable'])
+        self.env.cr.execute(
+            "DELETE FROM icecat_facet_count WHERE category_id IN %s", (tuple(categories.ids),)
+        )
+        self.env.cr.execute(f"""
+            INSERT INTO icecat_facet_count (category_id, feature_id, value, product_count)
+            SELECT cat.id, sv.feature_id, sv.value, count(DISTINCT pt.id)
+              FROM product_public_category cat
+              JOIN product_public_category sub ON sub.parent_path LIKE cat.parent_path || '%%'
+              JOIN {categ_field.relation} rel ON rel.{categ_field.column2} = sub.id
+              JOIN product_template pt ON pt.id = rel.{categ_field.column1}
+              JOIN icecat_spec_value sv ON sv.product_tmpl_id = pt.id
+              JOIN icecat_spec_feature feature ON feature.id = sv.feature_id
+             WHERE cat.id IN %s
+               AND feature.filterable
+               AND pt.active AND pt.is_published AND pt.sale_ok
+             GROUP BY cat.id, sv.feature_id, sv.value
+        """, (tuple(categories.ids),))
+        self.invalidate_model()
+
+    @api.model
+    def cron_refresh_facet_counts(self):
+        """Background step: recount the facets of the categories flagged as dirty"""
+        categories = self.env['product.public.category'].search(
+            [('icecat_facets_dirty', '=', True)], limit=FACET_REFRESH_BATCH_SIZE + 1
+        )
+        batch = categories[:FACET_REFRESH_BATCH_SIZE]
+        if batch:
+            # Cleared first: a product changed during the recount flags the category again
+            self.env.cr.execute(
+                "UPDATE product_public_category SET icecat_facets_dirty = false WHERE id IN %s",
+                (tuple(batch.ids),),
+            )
+            batch.invalidate_recordset(['icecat_facets_dirty'])
+            self._refresh_categories(batch)
+            _logger.info(f"Refreshed Icecat facet counts of {len(batch)} categories")
+        if len(categories) > FACET_REFRESH_BATCH_SIZE:
+            self._trigger_refresh()
+
+    @api.model
+    def _get_facets(self, category, selected=None):
+        """
+        Facets of a category page, ready for the shop template
+
+        :param category: product.public.category record
+        :param selected: dict mapping feature id to the set of selected values
+        :return: list of dicts with the ``feature`` and its ``values``, each a
+            dict with ``value``, ``count`` and ``selected``
+        """
+        selected = selected or {}
+        values = {}
+        for row in self.search_read(
+            [('category_id', '=', category.id), ('feature_id.filterable', '=', True)],
+            ['feature_id', 'value', 'product_count'],
+        ):
+            feature_id = row['feature_id'][0]
+            feature_values = values.setdefault(feature_id, [])
+            is_selected = row['value'] in selected.get(feature_id, ())
+            if len(feature_values) < FACET_VALUE_LIMIT or is_selected:
+                feature_values.append({
+                    'value': row['value'],
+                    'count': row['product_count'],
+                    'selected': is_selected,
+                })
+
+        features = self.env['icecat.spec.feature'].browse(list(values)).sorted(
+            lambda feature: (feature.group_name or '', feature.name)
+        )
+        return [
+            {'feature': feature, 'values': values[feature.id]}
+            for feature in features
+            # One single value filters nothing
+            if len(values[feature.id]) > 1 or selected.get(feature.id)
+        ]
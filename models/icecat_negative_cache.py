@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+
+from datetime import timedelta
+
+from odoo import api, fields, models
+
+# Fetch results that say Icecat has nothing for the GTIN (in this catalog)
+NEGATIVE_ERROR_CODES = ('not_found', 'brand_restricted')
+
+
+class IcecatNegativeCache(models.Model):
+    _name = 'icecat.negative.cache'
+    _description = 'Icecat Unknown GTIN Cache'
+    _rec_name = 'gtin'
+    _order = 'expires_at desc'
+
+    gtin = fields.Char(string='GTIN', required=True, index=True)
+    catalog_type = fields.Selection([
+        ('open', 'Icecat Open Catalog'),
+        ('full', 'Icecat Full Catalog'),
+    ], string='Catalog Type', required=True)
+    lang = fields.Char(string='Icecat Language', required=True)
+    reason = fields.Selection([
+        ('not_found', 'Not Found'),
+        ('brand_restricted', 'Brand Restricted'),
+    ], string='Reason', required=True)
+    expires_at = fields.Datetime(string='Expires', required=True, index=True)
+
+    _sql_constraints = [
+        ('gtin_catalog_lang_unique', 'unique(gtin, catalog_type, lang)',
+         'This GTIN is already cached as unknown for this catalog and language!'),
+    ]
+
+    @api.model
+    def _lookup(self, config, barcodes):
+        """
+        Find the GTINs Icecat recently answered it does not know
+
+        :param config: IcecatSyncConfig of the batch
+        :param barcodes: dict mapping a key (product id) to its GTIN
+        :return: dict mapping the keys with a valid entry to the cached reason
+        """
+        if not config.negative_cache_days or not barcodes:
+            return {}
+        reasons = {
+            entry['gtin']: entry['reason']
+            for entry in self.search_read([
+                ('gtin', 'in', list(set(barcodes.values()))),
+                ('catalog_type', '=', config.catalog_type),
+                ('lang', '=', config.lang),
+                ('expires_at', '>', fields.Datetime.now()),
+            ], ['gtin', 'reason'])
+        }
+        return {key: reasons[gtin] for key, gtin in barcodes.items() if gtin in reasons}
+
+    @api.model
+    def _store_results(self, config, fetch_results):
+        """
+        Remember the GTINs of a batch that Icecat answered with 404 or a brand
+        restriction, and forget the ones it now knows
+
+        Upserted on (gtin, catalog_type, lang), so concurrent syncs of the same
+        GTIN do not fail on the unique constraint.
+
+        :param fetch_results: iterable of fetch stage results with a ``barcode``
+        """
+        if not config.negative_cache_days:
+            return
+        negatives = {}
+        known = set()
+        for result in fetch_results:
+            barcode = result.get('barcode')
+            if not barcode or result.get('negative_cached'):
+                continue
+            if result.get('error_code') in NEGATIVE_ERROR_CODES:
+                negatives[barcode] = result['error_code']
+            elif result.get('success'):
+                known.add(barcode)
+        if not negatives and not known:
+            return
+
+        if known:
+            self.search([
+                ('gtin', 'in', list(known)),
+                ('catalog_type', '=', config.catalog_type),
+                ('lang', '=', config.lang),
+            ]).unlink()
+        if not negatives:
+            return
+
+        self.flush_model()
+        now = fields.Datetime.now()
+        gtins = sorted(negatives)
+        self.env.cr.execute("""
+            INSERT INTO icecat_negative_cache (
+                gtin, catalog_type, lang, reason, expires_at, create_uid, create_date, write_uid, write_date
+            )
+            SELECT n.gtin, %(catalog_type)s, %(lang)s, n.reason, %(expires_at)s, %(uid)s, %(now)s, %(uid)s, %(now)s
+              FROM unnest(%(gtins)s::varchar[], %(reasons)s::varchar[]) AS n (gtin, reason)
+            ON CONFLICT (gtin, catalog_type, lang) DO UPDATE
+               SET reason = EXCLUDED.reason, expires_at = EXCLUDED.expires_at,
+                   write_uid = EXCLUDED.write_uid, write_date = EXCLUDED.write_date
+        """, {
+            'catalog_type': config.catalog_type,
+            'lang': config.lang,
+            'expires_at': now + timedelta(days=config.negative_cache_days),
+            'uid': self.env.uid,
+            'now': now,
+            'gtins': gtins,
+            'reasons': [negatives[gtin] for gtin in gtins],
+        })
+        self.invalidate_model()
+
+    @api.model
+    def _invalidate_catalog(self, catalog_type):
+        """Drop every entry learned with the given catalog type"""
+        self.search([('catalog_type', '=', catalog_type)]).unlink()
+
+    @api.autovacuum
+    def _gc_expired_entries(self):
+        self.search([('expires_at', '<', fields.Datetime.now())]).unlink()
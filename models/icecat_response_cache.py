@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+
+import base64
+import json
+import zlib
+
+from odoo import api, fields, models
+
+
+class IcecatResponseCache(models.Model):
+    _name = 'icecat.response.cache'
+    _description = 'Icecat Raw Response Cache'
+    _rec_name = 'gtin'
+
+    gtin = fields.Char(string='GTIN', required=True, index=True)
+    lang = fields.Char(string='Icecat Language', required=True)
+    payload = fields.Binary(
+        string='Compressed Payload',
+        attachment=False,
+        help='zlib-compressed raw JSON body as returned by Icecat'
+    )
+    content_hash = fields.Char(
+        string='Content Hash',
+        help='sha256 of the raw JSON body'
+    )
+    fetch_time = fields.Datetime(string='Last Fetched')
+    etag = fields.Char(string='ETag')
+    last_modified = fields.Char(string='Last-Modified')
+
+    _sql_constraints = [
+        ('gtin_lang_unique', 'unique(gtin, lang)',
+         'There is already a cached Icecat response for this GTIN and language!'),
+    ]
+
+    @api.model
+    def _compress(self, raw):
+        return base64.b64encode(zlib.compress(raw))
+
+    def _get_raw(self):
+        """Return the decompressed raw body of this cache entry"""
+        self.ensure_one()
+        if not self.payload:
+            return None
+        return zlib.decompress(base64.b64decode(self.payload))
+
+    def _get_data(self):
+        """Return the decoded JSON of this cache entry"""
+        raw = self._get_raw()
+        return json.loads(raw) if raw else None
+
+    @api.model
+    def _store_responses(self, lang, fetch_results):
+        """
+        Store the successful responses of a batch
+
+        The payload is only compressed and rewritten when its hash changed;
+        otherwise only the fetch time and validators are refreshed. Entries
+        answered with a 304 only get a new fetch time. One upsert on
+        (gtin, lang), so a manual sync fetching the same GTIN as a cron does
+        not fail on the unique constraint.
+
+        :param lang: Icecat language the responses were requested in
+        :param fetch_results: iterable of fetch results from icecat.connector
+        """
+        fetched = {
+            result['barcode']: result
+            for result in fetch_results
+            if result.get('success') and result.get('barcode') and result.get('raw')
+        }
+        not_modified = [
+            result['barcode']
+            for result in fetch_results
+            if result.get('not_modified') and result.get('barcode')
+        ]
+        if not_modified:
+            self.search([('gtin', 'in', not_modified), ('lang', '=', lang)]).write({
+                'fetch_time': fields.Datetime.now(),
+            })
+        if not fetched:
+            return
+
+        self.flush_model()
+        gtins = sorted(fetched)
+        self.env.cr.execute(
+            "SELECT gtin, content_hash FROM icecat_response_cache WHERE lang = %s AND gtin = ANY(%s)",
+            (lang, gtins),
+        )
+        stored_hashes = dict(self.env.cr.fetchall())
+        # NULL payload: unchanged, the stored payload and hash are kept
+        payloads = [
+            None if stored_hashes.get(gtin) == fetched[gtin]['content_hash'] else self._compress(fetched[gtin]['raw'])
+            for gtin in gtins
+        ]
+        now = fields.Datetime.now()
+        self.env.cr.execute("""
+            INSERT INTO icecat_response_cache AS rc (
+                gtin, lang, payload, content_hash, fetch_time, etag, last_modified,
+                create_uid, create_date, write_uid, write_date
+            )
+            SELECT r.gtin, %(lang)s, r.payload, CASE WHEN r.payload IS NULL THEN NULL ELSE r.content_hash END,
+                   %(now)s, r.etag, r.last_modified, %(uid)s, %(now)s, %(uid)s, %(now)s
+              FROM unnest(%(gtins)s::varchar[], %(payloads)s::bytea[], %(hashes)s::varchar[],
+                          %(etags)s::varchar[], %(last_modified)s::varchar[])
+                   AS r (gtin, payload, content_hash, etag, last_modified)
+            ON CONFLICT (gtin, lang) DO UPDATE
+               SET fetch_time = EXCLUDED.fetch_time,
+                   etag = EXCLUDED.etag,
+                   last_modified = EXCLUDED.last_modified,
+                   payload = COALESCE(EXCLUDED.payload, rc.payload),
+                   content_hash = CASE WHEN EXCLUDED.payload IS NULL THEN rc.content_hash
+                                       ELSE EXCLUDED.content_hash END,
+                   write_uid = EXCLUDED.write_uid,
+                   write_date = EXCLUDED.write_date
+        """, {
+            'lang': lang,
+            'now': now,
+            'uid': self.env.uid,
+            'gtins': gtins,
+            'payloads': payloads,
+            'hashes': [fetched[gtin]['content_hash'] for gtin in gtins],
+            'etags': [fetched[gtin].get('etag') or None for gtin in gtins],
+            'last_modified': [fetched[gtin].get('last_modified') or None for gtin in gtins],
+        })
+        self.invalidate_model()
@@ -0,0 +1,337 @@
+# -*- coding: utf-8 -*-
+
+import logging
+
+from odoo import api, fields, models
+from odoo.osv import expression
+
+from .icecat_connector import NUMERIC_FEATURE_TYPES, canonical_unit, parse_spec_number
+
+_logger = logging.getLogger(__name__)
+
+# Products backfilled per run from the response cache
+SPEC_BACKFILL_BATCH_SIZE = 500
+# Last product id tried by the backfill; the sync itself stores the specs of later syncs
+SPEC_BACKFILL_CURSOR_PARAM = 'icecat_product_enrichment.spec_backfill_last_id'
+# Verhoog bij elke wijziging van parse_spec_number of SPEC_UNITS: alle numerieke waarden worden opnieuw geparsed
+SPEC_NUMBER_VERSION = 1
+# Longest value stored (4 bytes per character at most): the btree indexes on (feature, value)
+# and the facet count key reject rows over ~2.7 kB. Longer values are prose, not filter values
+SPEC_VALUE_MAX_LENGTH = 500
+
+
+def _feature_id(spec):
+    """Icecat feature id of a parsed spec, None when missing or invalid"""
+    try:
+        return int(spec.get('feature_id') or 0) or None
+    except (TypeError, ValueError):
+        return None
+
+
+class IcecatSpecFeature(models.Model):
+    """
+    One row per Icecat feature (e.g. "Screen diagonal")
+
+    Group, name and unit are stored once here instead of in every product.
+    """
+    _name = 'icecat.spec.feature'
+    _description = 'Icecat Specification Feature'
+    _order = 'group_name, name'
+
+    icecat_id = fields.Integer(string='Icecat Feature ID', required=True)
+    group_name = fields.Char(string='Group')
+    name = fields.Char(string='Name', required=True)
+    unit = fields.Char(string='Unit')
+    feature_type = fields.Char(string='Type', help='Icecat feature type, e.g. numerical, y_n, dropdown')
+    numeric_unit = fields.Char(
+        string='Numeric Unit',
+        help='Canonical unit of the numeric values of this feature, used by range filters'
+    )
+    numeric_version = fields.Integer(
+        string='Numeric Parse Version',
+        default=0,
+        readonly=True,
+        help='Parse version of the numeric values of this feature; anything else means they must be reparsed'
+    )
+    filterable = fields.Boolean(
+        string='Filterable',
+        help='Offer this feature as a filter, with precomputed counts, on the webshop category pages'
+    )
+    value_ids = fields.One2many('icecat.spec.value', 'feature_id', string='Values')
+
+    _sql_constraints = [
+        ('icecat_id_unique', 'unique(icecat_id)', 'This Icecat feature already exists!'),
+    ]
+
+    def write(self, vals):
+        res = super().write(vals)
+        if 'filterable' in vals:
+            # Recount the categories that hold products with these features
+            products = self.env['icecat.spec.value'].search([('feature_id', 'in', self.ids)]).product_tmpl_id
+            self.env['icecat.facet.count'].sudo()._mark_products_dirty(products)
+        return res
+
+    @api.model
+    def _ensure_features(self, specs):
+        """
+        Create missing features and refresh changed ones, in bulk
+
+        One upsert on the Icecat id, so queue workers meeting the same new
+        feature at the same time do not collide on the unique constraint.
+
+        :param specs: iterable of parsed specs (see ``_parse_product_data``)
+        :return: dict mapping Icecat feature id to the feature record id
+        """
+        wanted = {}
+        for spec in specs:
+            icecat_id = _feature_id(spec)
+            if icecat_id:
+                wanted[icecat_id] = (
+                    spec.get('group') or None,
+                    spec['name'],
+                    spec.get('unit') or None,
+                    spec.get('type') or None,
+                    canonical_unit(spec.get('unit'))[0] or None,
+                )
+        if not wanted:
+            return {}
+
+        # Sorted, so concurrent batches lock the rows in the same order
+        icecat_ids = sorted(wanted)
+        columns = list(zip(*(wanted[icecat_id] for icecat_id in icecat_ids)))
+        self.flush_model()
+        now = fields.Datetime.now()
+        # Values stored by other products were parsed for the old unit or type: numeric_version 0
+        self.env.cr.execute("""
+            INSERT INTO icecat_spec_feature AS f (
+                icecat_id, group_name, name, unit, feature_type, numeric_unit, numeric_version,
+                create_uid, create_date, write_uid, write_date
+            )
+            SELECT w.*, %(version)s, %(uid)s, %(now)s, %(uid)s, %(now)s
+              FROM unnest(%(icecat_ids)s::int4[], %(groups)s::varchar[], %(names)s::varchar[],
+                          %(units)s::varchar[], %(types)s::varchar[], %(numeric_units)s::varchar[])
+                   AS w (icecat_id, group_name, name, unit, feature_type, numeric_unit)
+            ON CONFLICT (icecat_id) DO UPDATE
+               SET group_name = EXCLUDED.group_name, name = EXCLUDED.name, unit = EXCLUDED.unit,
+                   feature_type = EXCLUDED.feature_type, numeric_unit = EXCLUDED.numeric_unit,
+                   numeric_version = CASE
+                       WHEN (f.unit, f.feature_type) IS DISTINCT FROM (EXCLUDED.unit, EXCLUDED.feature_type)
+                       THEN 0 ELSE f.numeric_version END,
+                   write_uid = EXCLUDED.write_uid, write_date = EXCLUDED.write_date
+             WHERE (f.group_name, f.name, f.unit, f.feature_type, f.numeric_unit)
+                   IS DISTINCT FROM (EXCLUDED.group_name, EXCLUDED.name, EXCLUDED.unit,
+                                     EXCLUDED.feature_type, EXCLUDED.numeric_unit)
+        """, {
+            'icecat_ids': icecat_ids,
+            'groups': list(columns[0]),
+            'names': list(columns[1]),
+            'units': list(columns[2]),
+            'types': list(columns[3]),
+            'numeric_units': list(columns[4]),
+            'version': SPEC_NUMBER_VERSION,
+            'uid': self.env.uid,
+            'now': now,
+        })
+        self.invalidate_model()
+        # Unchanged rows are not returned by the upsert, so read the ids afterwards
+        self.env.cr.execute(
+            "SELECT icecat_id, id FROM icecat_spec_feature WHERE icecat_id = ANY(%s)", (icecat_ids,)
+        )
+        return dict(self.env.cr.fetchall())
+
+
+class IcecatSpecValue(models.Model):
+    """
+    Compact product <-> feature value link table
+
+    Indexed on (feature, value) and on product, so spec based searches do not
+    need the JSON blob nor the [Icecat] product attributes.
+    """
+    _name = 'icecat.spec.value'
+    _description = 'Icecat Specification Value'
+    _rec_name = 'value'
+    _log_access = False
+
+    product_tmpl_id = fields.Many2one('product.template', string='Product', required=True, ondelete='cascade')
+    feature_id = fields.Many2one('icecat.spec.feature', string='Feature', required=True, ondelete='cascade')
+    value = fields.Char(string='Value', required=True)
+    value_float = fields.Float(
+        string='Numeric Value',
+        help='Value in the numeric unit of the feature, empty when it is not a number'
+    )
+
+    def init(self):
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS icecat_spec_value_feature_value_idx
+                ON icecat_spec_value (feature_id, value)
+        """)
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS icecat_spec_value_product_idx
+                ON icecat_spec_value (product_tmpl_id)
+        """)
+        # Range filters: one index scan per feature
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS icecat_spec_value_feature_float_idx
+                ON icecat_spec_value (feature_id, value_float) WHERE value_float IS NOT NULL
+        """)
+
+    @api.model
+    def _store_specifications(self, specifications):
+        """
+        Replace the spec values of a batch of products with two statements
+
+        :param specifications: dict mapping product id to its parsed specs;
+            an empty list clears the product
+        """
+        if not specifications:
+            return
+        feature_ids = self.env['icecat.spec.feature']._ensure_features(
+            spec for specs in specifications.values() for spec in specs
+        )
+
+        rows = {}
+        skipped = 0
+        for product_id, specs in specifications.items():
+            for spec in specs:
+                feature_id = feature_ids.get(_feature_id(spec))
+                if not feature_id:
+                    continue
+                value = str(spec['value'])
+                if len(value) > SPEC_VALUE_MAX_LENGTH:
+                    # Still shown from the JSON, only not searchable
+                    skipped += 1
+                    rows.pop((product_id, feature_id), None)
+                    continue
+                # Same feature twice in one product: the last one wins
+                rows[product_id, feature_id] = (
+                    value,
+                    parse_spec_number(spec['value'], spec.get('unit'), spec.get('type')),
+                )
+        if skipped:
+            _logger.debug(f"Skipped {skipped} Icecat spec values longer than {SPEC_VALUE_MAX_LENGTH} characters")
+
+        self.env['icecat.spec.feature'].flush_model()
+        self.env.cr.execute(
+            "DELETE FROM icecat_spec_value WHERE product_tmpl_id = ANY(%s)",
+            (list(specifications),),
+        )
+        if rows:
+            product_ids, feature_ids_col = zip(*rows)
+            values, numbers = zip(*rows.values())
+            self.env.cr.execute("""
+                INSERT INTO icecat_spec_value (product_tmpl_id, feature_id, value, value_float)
+                SELECT * FROM unnest(%s::int4[], %s::int4[], %s::varchar[], %s::float8[])
+            """, (list(product_ids), list(feature_ids_col), list(values), list(numbers)))
+        self.invalidate_model()
+
+    @api.model
+    def _reparse_numbers(self):
+        """Parse the stored values of outdated features again, once per distinct value"""
+        features = self.env['icecat.spec.feature'].search([('numeric_version', '!=', SPEC_NUMBER_VERSION)])
+        for feature in features:
+            feature.numeric_unit = canonical_unit(feature.unit)[0] or False
+            if feature.feature_type not in NUMERIC_FEATURE_TYPES:
+                self.env.cr.execute("""
+                    UPDATE icecat_spec_value SET value_float = NULL
+                     WHERE feature_id = %s AND value_float IS NOT NULL
+                """, (feature.id,))
+                continue
+            self.env.cr.execute(
+                "SELECT DISTINCT value FROM icecat_spec_value WHERE feature_id = %s", (feature.id,)
+            )
+            values = [row[0] for row in self.env.cr.fetchall()]
+            if not values:
+                continue
+            self.env.cr.execute("""
+                UPDATE icecat_spec_value sv SET value_float = parsed.number
+                  FROM unnest(%s::varchar[], %s::float8[]) AS parsed (value, number)
+                 WHERE sv.feature_id = %s AND sv.value = parsed.value
+            """, (values, [parse_spec_number(value, feature.unit, feature.feature_type) for value in values], feature.id))
+        features.write({'numeric_version': SPEC_NUMBER_VERSION})
+        self.invalidate_model(['value_float'])
+
+    @api.model
+    def _filter_domain(self, filters, ranges=None):
+        """
+        Product domain for the webshop spec filters: the values of one feature
+        are OR-ed, different features and ranges are AND-ed
+
+        :param filters: dict mapping the feature id to the selected values
+        :param ranges: dict mapping the feature id to its (minimum, maximum),
+            in the numeric unit of the feature; a bound may be None
+        """
+        return expression.AND([
+            [('icecat_spec_value_ids', 'any', [('feature_id', '=', feature_id), ('value', 'in', list(values))])]
+            for feature_id, values in (filters or {}).items()
+        ] + [
+            self._range_domain(feature_id, minimum, maximum)
+            for feature_id, (minimum, maximum) in (ranges or {}).items()
+        ])
+
+    @api.model
+    def _range_domain(self, feature_id, minimum=None, maximum=None, unit=None):
+        """
+        Product domain for "value of the feature between minimum and maximum"
+
+        Answered by the (feature_id, value_float) index.
+
+        :param unit: unit of the bounds, the numeric unit of the feature when omitted
+        """
+        factor = canonical_unit(unit)[1] if unit else 1.0
+        conditions = [('feature_id', '=', feature_id), ('value_float', '!=', False)]
+        if minimum is not None:
+            conditions.append(('value_float', '>=', minimum * factor))
+        if maximum is not None:
+            conditions.append(('value_float', '<=', maximum * factor))
+        return [('icecat_spec_value_ids', 'any', conditions)]
+
+    @api.model
+    def cron_backfill_from_cache(self):
+        """
+        Fill the store for synced products that predate it, from the cached
+        Icecat responses (no API calls), and reparse numeric values when needed
+
+        Walks the products by id from a cursor, so products without storable
+        specs (no feature id, or only over-long values) are tried only once.
+        """
+        self._reparse_numbers()
+        ICP = self.env['ir.config_parameter'].sudo()
+        try:
+            last_id = int(ICP.get_param(SPEC_BACKFILL_CURSOR_PARAM) or 0)
+        except ValueError:
+            last_id = 0
+        self.env['product.template'].flush_model(['icecat_gtin', 'icecat_sync_status', 'icecat_specifications_raw'])
+        self.env.cr.execute("""
+            SELECT pt.id, rc.id
+              FROM product_template pt
+              JOIN icecat_response_cache rc ON rc.gtin = pt.icecat_gtin AND rc.lang = %s
+             WHERE pt.id > %s
+               AND pt.icecat_sync_status = 'synced'
+               AND pt.icecat_specifications_raw IS NOT NULL
+               AND NOT EXISTS (SELECT 1 FROM icecat_spec_value sv WHERE sv.product_tmpl_id = pt.id)
+             ORDER BY pt.id
+             LIMIT %s
+        """, (self.env['icecat.connector']._get_icecat_lang(), last_id, SPEC_BACKFILL_BATCH_SIZE))
+        rows = self.env.cr.fetchall()
+        if not rows:
+            return
+        ICP.set_param(SPEC_BACKFILL_CURSOR_PARAM, str(rows[-1][0]))
+
+        Connector = self.env['icecat.connector']
+        entries = self.env['icecat.response.cache'].browse([row[1] for row in rows])
+        specifications = {}
+        for product_id, entry in zip([row[0] for row in rows], entries):
+            product_info = Connector._parse_product_data(entry._get_data() or {})
+            if product_info and product_info['specifications']:
+                specifications[product_id] = product_info['specifications']
+        self._store_specifications(specifications)
+        # Their categories may already show facets of filterable features
+        self.env['icecat.facet.count'].sudo()._mark_products_dirty(
+            self.env['product.template'].browse(list(specifications))
+        )
+        _logger.info(f"Backfilled Icecat specifications of {len(specifications)} products")
+
+        if len(rows) == SPEC_BACKFILL_BATCH_SIZE:
+            cron = self.env.ref('icecat_product_enrichment.ir_cron_backfill_spec_values', raise_if_not_found=False)
+            if cron:
+                cron._trigger()
@@ -0,0 +1,380 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import os
+import socket
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from odoo import api, fields, models, _
+from odoo.tools import config as odoo_config
+
+_logger = logging.getLogger(__name__)
+
+PRIORITY_UPDATE = 5
+PRIORITY_NEW = 10
+PRIORITY_MANUAL = 20
+MAX_JOB_ATTEMPTS = 3
+DEFAULT_LEASE_MINUTES = 30
+DONE_JOB_RETENTION_DAYS = 7
+DEFAULT_COMMIT_CHUNK_SIZE = 20
+# Deel van de worker time limit dat een cron run mag gebruiken
+CRON_TIME_BUDGET_RATIO = 0.75
+
+
+def _cron_time_budget():
+    """
+    Seconds a cron run may spend, derived from the worker limits
+
+    Uses ``limit_time_real_cron`` (falling back to ``limit_time_real`` when it
+    is -1); None when the worker has no real time limit.
+    """
+    limit = odoo_config.get('limit_time_real_cron', -1)
+    if limit is None or limit < 0:
+        limit = odoo_config.get('limit_time_real', 0)
+    return limit * CRON_TIME_BUDGET_RATIO if limit and limit > 0 else None
+
+
+class IcecatSyncJob(models.Model):
+    """
+    Durable queue of Icecat fetches, one job per GTIN
+
+    Any number of cron workers can drain the queue at the same time: jobs are
+    claimed with ``FOR UPDATE SKIP LOCKED`` and leased for a limited time, so a
+    job of a crashed worker becomes claimable again once its lease expires.
+    Because a GTIN has at most one pending job, it is never fetched twice.
+    """
+    _name = 'icecat.sync.job'
+    _description = 'Icecat Sync Job'
+    _order = 'priority desc, id'
+
+    gtin = fields.Char(string='GTIN', required=True, index=True, readonly=True)
+    product_tmpl_ids = fields.Many2many(
+        'product.template',
+        'icecat_sync_job_product_rel',
+        'job_id',
+        'product_tmpl_id',
+        string='Products',
+        readonly=True,
+    )
+    priority = fields.Integer(string='Priority', default=PRIORITY_UPDATE)
+    state = fields.Selection([
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ], string='State', default='pending', required=True, index=True, readonly=True)
+    lease_expires = fields.Datetime(string='Lease Expires', readonly=True)
+    attempts = fields.Integer(string='Attempts', readonly=True)
+    worker = fields.Char(string='Worker', readonly=True)
+    error_message = fields.Text(string='Error Message', readonly=True)
+
+    def init(self):
+        # Eén wachtende job per GTIN: zo wordt een GTIN nooit dubbel opgehaald
+        self.env.cr.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS icecat_sync_job_pending_gtin_uniq
+                ON icecat_sync_job (gtin) WHERE state = 'pending'
+        """)
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS icecat_sync_job_claim_idx
+                ON icecat_sync_job (priority DESC, id) WHERE state IN ('pending', 'running')
+        """)
+
+    @api.model
+    def _enqueue(self, products, priority=PRIORITY_UPDATE):
+        """
+        Queue products for synchronisation, merging them per GTIN
+
+        Products whose GTIN already has a pending job are added to that job,
+        whose priority is raised when needed. Products without a valid GTIN
+        are ignored, and so are products whose GTIN a worker is fetching right
+        now: a second job would be claimed at once and fetch it twice.
+
+        One upsert on the pending GTIN index, so two transactions enqueueing
+        the same GTIN at once (e.g. two crons, or the wizard) merge into the
+        same job instead of failing on the unique index.
+
+        :return: the pending icecat.sync.job records covering the queued products
+        """
+        Job = self.sudo()
+        products_by_gtin = defaultdict(list)
+        for product in products:
+            if product.icecat_gtin:
+                products_by_gtin[product.icecat_gtin].append(product.id)
+        if not products_by_gtin:
+            return Job
+
+        self.flush_model()
+        now = fields.Datetime.now()
+        # Running jobs with an expired lease are claimed again, so those GTINs are queued
+        self.env.cr.execute("""
+            SELECT DISTINCT gtin FROM icecat_sync_job
+             WHERE state = 'running' AND lease_expires >= %s AND gtin = ANY(%s)
+        """, (now, list(products_by_gtin)))
+        for (gtin,) in self.env.cr.fetchall():
+            del products_by_gtin[gtin]
+        if not products_by_gtin:
+            return Job
+
+        self.env.cr.execute("""
+            INSERT INTO icecat_sync_job (gtin, priority, state, attempts, create_uid, create_date, write_uid, write_date)
+            SELECT gtin, %(priority)s, 'pending', 0, %(uid)s, %(now)s, %(uid)s, %(now)s
+              FROM unnest(%(gtins)s::varchar[]) AS gtin
+            ON CONFLICT (gtin) WHERE state = 'pending' DO UPDATE
+               SET priority = GREATEST(icecat_sync_job.priority, EXCLUDED.priority),
+                   write_uid = EXCLUDED.write_uid, write_date = EXCLUDED.write_date
+         RETURNING id, gtin
+        """, {'priority': priority, 'uid': self.env.uid, 'now': now, 'gtins': list(products_by_gtin)})
+        job_ids = dict((gtin, job_id) for job_id, gtin in self.env.cr.fetchall())
+
+        job_col, product_col = zip(*(
+            (job_ids[gtin], product_id)
+            for gtin, product_ids in products_by_gtin.items()
+            for product_id in product_ids
+        ))
+        self.env.cr.execute("""
+            INSERT INTO icecat_sync_job_product_rel (job_id, product_tmpl_id)
+            SELECT * FROM unnest(%s::int4[], %s::int4[])
+            ON CONFLICT DO NOTHING
+        """, (list(job_col), list(product_col)))
+        self.invalidate_model()
+        self.env['product.template'].invalidate_model(['icecat_sync_job_ids'])
+        return Job.browse(job_ids.values())
+
+    @api.model
+    def _claim(self, limit, job_ids=None, lease_minutes=DEFAULT_LEASE_MINUTES):
+        """
+        Claim up to ``limit`` jobs for this worker
+
+        Pending jobs and running jobs whose lease expired are claimable. Rows
+        locked by other workers are skipped, so concurrent workers never get the
+        same job. Expired jobs that used up their attempts are failed first.
+
+        :param job_ids: optional ids restricting which jobs may be claimed
+        :return: the claimed icecat.sync.job records, state ``running``
+        """
+        now = fields.Datetime.now()
+        self.flush_model()
+        self.env.cr.execute("""
+            UPDATE icecat_sync_job
+               SET state = 'failed', lease_expires = NULL,
+                   error_message = 'Lease expired too often, the worker probably crashed'
+             WHERE state = 'running' AND lease_expires < %s AND attempts >= %s
+        """, (now, MAX_JOB_ATTEMPTS))
+
+        params = {
+            'now': now,
+            'lease': now + timedelta(minutes=lease_minutes),
+            'worker': f"{socket.gethostname()}:{os.getpid()}",
+            'limit': limit,
+            'job_ids': tuple(job_ids or ()) or (0,),
+        }
+        self.env.cr.execute(f"""
+            UPDATE icecat_sync_job
+               SET state = 'running', lease_expires = %(lease)s,
+                   attempts = attempts + 1, worker = %(worker)s
+             WHERE id IN (
+                SELECT id FROM icecat_sync_job
+                 WHERE (state = 'pending' OR (state = 'running' AND lease_expires < %(now)s))
+                   {'AND id IN %(job_ids)s' if job_ids is not None else ''}
+                 ORDER BY priority DESC, id
+                 LIMIT %(limit)s
+                   FOR UPDATE SKIP LOCKED
+             )
+         RETURNING id
+        """, params)
+        claimed_ids = [row[0] for row in self.env.cr.fetchall()]
+        if claimed_ids:
+            _logger.info(f"Claimed {len(claimed_ids)} Icecat sync jobs as {params['worker']}")
+        self.invalidate_model(['state', 'lease_expires', 'attempts', 'worker', 'error_message'])
+        return self.sudo().browse(claimed_ids)
+
+    def _finish(self, results):
+        """
+        Close claimed jobs based on the sync results of their products
+
+        Jobs skipped because the circuit breaker was open go back to pending,
+        unless their GTIN got a new pending job in the meantime.
+        """
+        skipped = self.filtered(lambda job: any(
+            results.get(product.id, {}).get('skipped') for product in job.product_tmpl_ids
+        ))
+        if skipped:
+            requeued_gtins = set(self.search([
+                ('gtin', 'in', skipped.mapped('gtin')),
+                ('state', '=', 'pending'),
+            ]).mapped('gtin'))
+            for job in skipped:
+                job.write({
+                    'state': 'failed' if job.gtin in requeued_gtins else 'pending',
+                    'error_message': results.get(job.product_tmpl_ids[:1].id, {}).get('error') or False,
+                    'lease_expires': False,
+                })
+
+        for job in self - skipped:
+            errors = [
+                results.get(product.id, {}).get('error') or product.icecat_error_message or ''
+                for product in job.product_tmpl_ids
+                if not results.get(product.id, {}).get('success')
+                and product.icecat_sync_status != 'no_data'
+            ]
+            job.write({
+                'state': 'failed' if errors else 'done',
+                'error_message': '\n'.join(filter(None, errors)) or False,
+                'lease_expires': False,
+            })
+
+    @api.model
+    def _process_queue(self, sync_type, limit=None, job_ids=None, config=None, cron_xmlid=None):
+        """
+        Claim jobs from the queue and synchronise their products
+
+        Called from a cron (``cron_xmlid`` given) the queue is drained in chunks
+        of ``commit_chunk_size`` jobs, each committed on its own and checkpointed
+        into the sync log. Before starting a chunk that would not fit in the
+        time budget of the worker the run stops and triggers its cron again, so
+        a large backlog is worked off over several runs without ever losing
+        completed chunks. Without ``cron_xmlid`` the same chunks all run in the
+        current transaction.
+
+        :param sync_type: sync_type of the icecat.sync.log created for this run
+        :param limit: maximum number of jobs (GTINs) to claim, None for no limit
+        :param job_ids: optional ids restricting which jobs may be claimed
+        :param config: IcecatSyncConfig to use, loaded when omitted
+        :param cron_xmlid: xml id of the calling ir.cron
+        :return: dict with the synced, errors, no_data and total counts
+        """
+        config = config or self.env['icecat.connector']._load_sync_config()
+        commit = bool(cron_xmlid)
+        budget = _cron_time_budget() if commit else None
+        # Also chunked without commits: bounds what one sync batch holds in memory
+        chunk_size = config.commit_chunk_size
+        started = time.monotonic()
+        slowest_chunk = 0.0
+        claimed = 0
+        out_of_time = False
+        run_cache = {}
+        log = None
+        counts = {'synced': 0, 'errors': 0, 'no_data': 0, 'skipped': 0, 'total': 0}
+
+        while True:
+            size = chunk_size
+            if limit is not None:
+                size = min(size or limit, limit - claimed)
+                if size <= 0:
+                    break
+            if budget and time.monotonic() - started + slowest_chunk > budget:
+                out_of_time = True
+                break
+
+            chunk_started = time.monotonic()
+            jobs = self._claim(size, job_ids=job_ids, lease_minutes=config.job_lease_minutes)
+            if not jobs:
+                break
+            claimed += len(jobs)
+            if not log:
+                log = self.env['icecat.sync.log'].sudo().create({
+                    'sync_type': sync_type,
+                    'status': 'running',
+                })
+            if commit:
+                # Claims and log are visible to the other workers from here on
+                self.env.cr.commit()
+
+            try:
+                chunk_counts = jobs._process_chunk(log, config, run_cache)
+            except Exception as e:
+                if commit:
+                    self.env.cr.rollback()
+                    jobs.write({
+                        'state': 'failed',
+                        'error_message': str(e),
+                        'lease_expires': False,
+                    })
+                log.write({
+                    'end_time': fields.Datetime.now(),
+                    'status': 'failed',
+                    'error_message': str(e),
+                })
+                if commit:
+                    self.env.cr.commit()
+                raise
+
+            for key, value in chunk_counts.items():
+                counts[key] += value
+            log._add_counters({
+                'total_products': chunk_counts['total'],
+                'synced_count': chunk_counts['synced'],
+                'error_count': chunk_counts['errors'],
+                'no_data_count': chunk_counts['no_data'],
+                'chunk_count': 1,
+            })
+            log.write({'last_checkpoint': fields.Datetime.now()})
+            if commit:
+                self.env.cr.commit()
+            slowest_chunk = max(slowest_chunk, time.monotonic() - chunk_started)
+
+            breaker = config.circuit_breaker
+            if breaker and breaker.is_open:
+                # Icecat is down or refuses us: stop instead of burning worker time
+                log.write({
+                    'error_message': _('Stopped: Icecat circuit breaker opened (%s). The next run probes again.')
+                    % (breaker.last_error or ''),
+                })
+                break
+
+        if not log:
+            return {}
+
+        rescheduled = out_of_time and bool(self.search_count([('state', '=', 'pending')], limit=1))
+        log.write({
+            'end_time': fields.Datetime.now(),
+            'status': 'completed',
+            'rescheduled': rescheduled,
+        })
+        if rescheduled:
+            _logger.info(f"Icecat sync stopped after {claimed} jobs to stay within the time budget, rescheduling")
+            cron = self.env.ref(cron_xmlid, raise_if_not_found=False)
+            if cron:
+                cron._trigger()
+        return counts
+
+    def _process_chunk(self, log, config, run_cache):
+        """Synchronise the products of these claimed jobs and close the jobs"""
+        products = self.env['product.template'].browse(self.product_tmpl_ids.ids)
+        counts = {'synced': 0, 'errors': 0, 'no_data': 0, 'skipped': 0, 'total': len(products)}
+        results = {}
+        if products:
+            results = self.env['icecat.connector'].sync_products(
+                products, log=log, run_cache=run_cache, config=config,
+            )
+        for product in products:
+            result = results.get(product.id, {})
+            if result.get('success'):
+                counts['synced'] += 1
+            elif result.get('skipped'):
+                counts['skipped'] += 1
+            elif product.icecat_sync_status == 'no_data':
+                counts['no_data'] += 1
+            else:
+                counts['errors'] += 1
+        self._finish(results)
+        return counts
+
+    @api.model
+    def cron_process_queue(self):
+        """Scheduled action draining the sync queue; safe to run on several workers"""
+        config = self.env['icecat.connector']._load_sync_config()
+        if not config.auto_sync_enabled:
+            return
+        return self._process_queue(
+            'queue', config=config,
+            cron_xmlid='icecat_product_enrichment.ir_cron_process_sync_queue',
+        )
+
+    @api.autovacuum
+    def _gc_done_jobs(self):
+        """Remove finished jobs after a week"""
+        limit_date = fields.Datetime.now() - timedelta(days=DONE_JOB_RETENTION_DAYS)
+        self.sudo().search([('state', '=', 'done'), ('write_date', '<', limit_date)]).unlink()
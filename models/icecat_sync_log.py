@@ -13,6 +13,7 @@ class IcecatSyncLog(models.Model):
         ('new', 'New Products'),
         ('update', 'Update Products'),
         ('manual', 'Manual Sync'),
+        ('queue', 'Sync Queue'),
     ], string='Sync Type', required=True)
     start_time = fields.Datetime(string='Start Time', default=fields.Datetime.now)
     end_time = fields.Datetime(string='End Time')
@@ -21,12 +22,71 @@ class IcecatSyncLog(models.Model):
     synced_count = fields.Integer(string='Successfully Synced')
     error_count = fields.Integer(string='Errors')
     no_data_count = fields.Integer(string='No Data Available')
+    skipped_count = fields.Integer(
+        string='Skipped',
+        help='Products left untouched because Icecat was unavailable (circuit breaker)'
+    )
+    negative_cache_hit_count = fields.Integer(
+        string='Known Unknown GTINs',
+        help='Products not requested because Icecat recently answered it does not know their GTIN'
+    )
+    catalog_miss_count = fields.Integer(
+        string='Not in Catalog',
+        help='Products marked as no data without a request because their GTIN is not in the Icecat catalog index'
+    )
+    unchanged_count = fields.Integer(
+        string='Unchanged',
+        help='Synced products whose Icecat data was identical to the last sync'
+    )
     status = fields.Selection([
         ('running', 'Running'),
         ('completed', 'Completed'),
         ('failed', 'Failed'),
     ], string='Status', default='running')
     error_message = fields.Text(string='Error Message')
+    chunk_count = fields.Integer(
+        string='Committed Chunks',
+        help='Number of chunks processed and committed during this run'
+    )
+    last_checkpoint = fields.Datetime(
+        string='Last Checkpoint',
+        help='Time the last chunk of this run was committed'
+    )
+    rescheduled = fields.Boolean(
+        string='Rescheduled',
+        help='The run stopped before the time limit of the worker and triggered itself again'
+    )
+    http_request_count = fields.Integer(string='HTTP Requests')
+    http_200_count = fields.Integer(
+        string='Full Responses (200)',
+        help='Icecat answered with the complete product data'
+    )
+    http_304_count = fields.Integer(
+        string='Not Modified (304)',
+        help='Icecat confirmed our cached copy is still current, no data transferred'
+    )
+    http_connection_reused_count = fields.Integer(
+        string='Reused Connections',
+        help='HTTP requests sent over an already open keep-alive connection'
+    )
+    http_throttled_count = fields.Integer(
+        string='Throttled (429)',
+        help='Requests Icecat refused because of its rate limit'
+    )
+    http_throttle_rate = fields.Float(
+        string='Throttle Rate (%)',
+        compute='_compute_http_throttle_rate',
+        store=True,
+        help='Share of the HTTP requests that Icecat throttled'
+    )
+    http_retry_count = fields.Integer(
+        string='Retries',
+        help='Requests repeated after a timeout, connection error, 429 or 5xx answer'
+    )
+    rate_limit_wait = fields.Float(
+        string='Rate Limit Wait (seconds)',
+        help='Total time the fetch threads waited for the rate limiter'
+    )
 
     @api.depends('start_time', 'sync_type')
     def _compute_name(self):
@@ -44,3 +104,19 @@ class IcecatSyncLog(models.Model):
                 record.duration = delta.total_seconds()
             else:
                 record.duration = 0.0
+
+    @api.depends('http_request_count', 'http_throttled_count')
+    def _compute_http_throttle_rate(self):
+        for record in self:
+            if record.http_request_count:
+                record.http_throttle_rate = 100.0 * record.http_throttled_count / record.http_request_count
+            else:
+                record.http_throttle_rate = 0.0
+
+    def _add_counters(self, counters):
+        """Increment integer counters of this log with the given deltas"""
+        self.ensure_one()
+        self.write({
+            field_name: self[field_name] + delta
+            for field_name, delta in counters.items()
+        })
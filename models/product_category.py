@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+
+from odoo import api, fields, models
+
+from .icecat_category_mapping import invalidate_category_caches
+
+
+class ProductCategory(models.Model):
+    _inherit = 'product.category'
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        invalidate_category_caches()
+        return super().create(vals_list)
+
+    def write(self, vals):
+        invalidate_category_caches()
+        return super().write(vals)
+
+    def unlink(self):
+        invalidate_category_caches()
+        return super().unlink()
+
+
+class ProductPublicCategory(models.Model):
+    _inherit = 'product.public.category'
+
+    icecat_facets_dirty = fields.Boolean(
+        string='Icecat Facets Outdated',
+        readonly=True,
+        copy=False,
+        help='The Icecat facet counts of this category are recomputed by the background step'
+    )
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        invalidate_category_caches()
+        return super().create(vals_list)
+
+    def write(self, vals):
+        invalidate_category_caches()
+        if 'parent_id' not in vals:
+            return super().write(vals)
+        # Moving a category changes the counts of its old and new parents
+        self.env['icecat.facet.count'].sudo()._mark_dirty(self)
+        res = super().write(vals)
+        self.env['icecat.facet.count'].sudo()._mark_dirty(self)
+        return res
+
+    def unlink(self):
+        invalidate_category_caches()
+        return super().unlink()
@@ -4,4 +4,5 @@ from odoo import fields, models
 class ProductImage(models.Model):
     _inherit = 'product.image'
 
-    icecat_url = fields.Char(string="Icecat Image URL", help="Voor deduplicatie bij sync")
\ No newline at end of file
+    icecat_url = fields.Char(string="Icecat Image URL", help="Voor deduplicatie bij sync")
+    icecat_image_hash = fields.Char(string="Icecat Image Hash", help="sha256 van de gedownloade afbeelding")
\ No newline at end of file
@@ -1,9 +1,19 @@
 # -*- coding: utf-8 -*-
 
 from collections import defaultdict
+from markupsafe import escape
 from odoo import api, fields, models, _
 from odoo.exceptions import UserError
 
+from .icecat_connector import normalize_gtin
+from .icecat_sync_job import PRIORITY_NEW, PRIORITY_UPDATE
+
+# Verhoog bij elke wijziging van de specificatie-HTML: alles wordt dan opnieuw opgebouwd
+SPECS_RENDER_VERSION = 2
+SPECS_RENDER_BATCH_SIZE = 500
+# Fields that decide whether (and where) a product counts in the webshop facets
+FACET_FIELDS = ('public_categ_ids', 'is_published', 'website_published', 'active', 'sale_ok')
+
 
 class ProductTemplate(models.Model):
     _inherit = 'product.template'
@@ -39,68 +49,182 @@ class ProductTemplate(models.Model):
         help='Category from Icecat'
     )
 
+    icecat_sync_fingerprint = fields.Char(
+        string='Icecat Sync Fingerprint',
+        readonly=True,
+        copy=False,
+        help='Hash of the Icecat payload and sync options this product was last enriched from'
+    )
+
+    icecat_image_url = fields.Char(
+        string='Icecat Main Image URL',
+        readonly=True,
+        copy=False,
+        help='Icecat URL of the current main image'
+    )
+    icecat_image_hash = fields.Char(
+        string='Icecat Main Image Hash',
+        readonly=True,
+        copy=False,
+        help='sha256 of the current main image, used to skip identical image writes'
+    )
+    icecat_gtin = fields.Char(
+        string='Icecat GTIN',
+        compute='_compute_icecat_gtin',
+        store=True,
+        index=True,
+        help='First valid variant barcode, normalized to 14 digits; products without one are not synced'
+    )
+    icecat_sync_job_ids = fields.Many2many(
+        'icecat.sync.job',
+        'icecat_sync_job_product_rel',
+        'product_tmpl_id',
+        'job_id',
+        string='Icecat Sync Jobs',
+        readonly=True,
+        copy=False,
+    )
+
     icecat_specifications_raw = fields.Json(
         string='Icecat Specifications Raw',
         help='Raw specifications data from Icecat, stored as JSON'
     )
 
+    icecat_spec_value_ids = fields.One2many(
+        'icecat.spec.value',
+        'product_tmpl_id',
+        string='Icecat Specification Values',
+        readonly=True,
+        copy=False,
+    )
+
     icecat_specifications_grouped = fields.Html(
         string='Gegroepeerde Specificaties',
-        compute='_compute_icecat_specifications_grouped',
-        help='Specificaties gegroepeerd per categorie, Tweakers-stijl'
+        translate=True,
+        # Gestript van scripts en event handlers, maar de data-bs-*/aria-* attributen
+        # en de <button> elementen van de accordion blijven staan
+        sanitize_attributes=False,
+        sanitize_form=False,
+        readonly=True,
+        copy=False,
+        help='Specificaties gegroepeerd per categorie, Tweakers-stijl; '
+             'vooraf opgebouwd per taal door de achtergrondtaak'
+    )
+    icecat_specs_render_version = fields.Integer(
+        string='Specifications Render Version',
+        default=0,
+        readonly=True,
+        copy=False,
+        help='Render version of the stored specification HTML; anything else means it must be rebuilt'
     )
 
-    @api.depends('icecat_specifications_raw')
-    def _compute_icecat_specifications_grouped(self):
-        """Genereer HTML-tabel per Icecat-categorie, zoals op Tweakers"""
+    @api.depends('product_variant_ids.barcode')
+    def _compute_icecat_gtin(self):
         for product in self:
-            specs_html = ''
-            grouped_specs = defaultdict(list)
-            
-            # Gebruik raw specifications data in plaats van attributes
-            if product.icecat_specifications_raw:
-                for spec in product.icecat_specifications_raw:
-                    group = spec.get('group', 'Algemeen')
-                    grouped_specs[group].append({
-                        'name': spec.get('name', ''),
-                        'value': spec.get('value', ''),
-                        'unit': spec.get('unit', '')
-                    })
-            
-            # Bouw HTML: secties met tabel, zoals Tweakers
-            for group, specs in grouped_specs.items():
-                specs_html += f'''
-                    <div class="specs-section">
-                        <h4 class="specs-group-title">{group}</h4>
-                        <table class="table table-sm table-striped specs-table">
-                            <tbody>
-                '''
-                for spec in specs:
-                    specs_html += f'''
-                                <tr>
-                                    <td class="spec-key"><strong>{spec['name']}</strong></td>
-                                    <td class="spec-value">{spec['value']} {spec['unit']}</td>
-                                </tr>
-                    '''
-                specs_html += '''
-                            </tbody>
-                        </table>
-                    </div>
-                '''
-            
-            product.icecat_specifications_grouped = specs_html if specs_html else '<p>Geen specificaties beschikbaar.</p>'
+            gtins = (normalize_gtin(barcode) for barcode in product.product_variant_ids.mapped('barcode'))
+            product.icecat_gtin = next(filter(None, gtins), False)
+
+    def write(self, vals):
+        if 'icecat_specifications_raw' in vals and 'icecat_specs_render_version' not in vals:
+            # Alleen markeren: de HTML wordt op de achtergrond opnieuw opgebouwd
+            vals = dict(vals, icecat_specs_render_version=0)
+        facet_products = self.sudo().filtered('icecat_spec_value_ids') if any(f in vals for f in FACET_FIELDS) else None
+        if facet_products:
+            # Old categories before, new categories after the write
+            self.env['icecat.facet.count'].sudo()._mark_products_dirty(facet_products)
+        res = super().write(vals)
+        if facet_products and 'public_categ_ids' in vals:
+            self.env['icecat.facet.count'].sudo()._mark_products_dirty(facet_products)
+        return res
+
+    def unlink(self):
+        facet_products = self.sudo().filtered('icecat_spec_value_ids')
+        if facet_products:
+            self.env['icecat.facet.count'].sudo()._mark_products_dirty(facet_products)
+        return super().unlink()
+
+    @api.model
+    def _search_get_detail(self, website, order, options):
+        # The shop grid is searched through here, not through _get_shop_domain
+        result = super()._search_get_detail(website, order, options)
+        if options.get('icecat_spec_filters') or options.get('icecat_spec_ranges'):
+            result['base_domain'] = result['base_domain'] + [self.env['icecat.spec.value']._filter_domain(
+                options.get('icecat_spec_filters'), options.get('icecat_spec_ranges'),
+            )]
+        return result
+
+    def _icecat_specifications_html(self):
+        """
+        Genereer de accordion per Icecat-categorie, zoals op Tweakers
+
+        De markup is compleet (Bootstrap collapse), dus de productpagina heeft
+        geen JavaScript nodig om hem op te bouwen. Alle Icecat-waarden worden
+        ge-escaped; het veld wordt daarnaast gesanitized, omdat iedereen met
+        schrijfrechten op het product het via RPC kan overschrijven.
+        """
+        self.ensure_one()
+        grouped_specs = defaultdict(list)
+        for spec in self.icecat_specifications_raw or []:
+            grouped_specs[spec.get('group') or _('Algemeen')].append(spec)
+
+        parts = []
+        for idx, (group, specs) in enumerate(grouped_specs.items()):
+            collapse_id = f'icecat-collapse-{self.id}-{idx}'
+            parts.append(
+                '<div class="accordion-item specs-section">'
+                '<h2 class="accordion-header">'
+                f'<button class="accordion-button collapsed specs-group-title" type="button" data-bs-toggle="collapse" '
+                f'data-bs-target="#{collapse_id}" aria-expanded="false" aria-controls="{collapse_id}">{escape(group)}</button>'
+                '</h2>'
+                f'<div id="{collapse_id}" class="accordion-collapse collapse">'
+                '<div class="accordion-body p-0">'
+                '<table class="table table-sm table-striped specs-table"><tbody>'
+            )
+            parts.extend(
+                f'<tr><td class="spec-key"><strong>{escape(spec.get("name", ""))}</strong></td>'
+                f'<td class="spec-value">{escape(spec.get("value", ""))} {escape(spec.get("unit", ""))}</td></tr>'
+                for spec in specs
+            )
+            parts.append('</tbody></table></div></div></div>')
+        return ''.join(parts)
+
+    def _render_icecat_specifications(self):
+        """Render the grouped specifications in every installed language and mark them current"""
+        for lang, _lang_name in self.env['res.lang'].get_installed():
+            for product in self.with_context(lang=lang):
+                product.icecat_specifications_grouped = (
+                    product._icecat_specifications_html() if product.icecat_specifications_raw else False
+                )
+        self.write({'icecat_specs_render_version': SPECS_RENDER_VERSION})
+
+    @api.model
+    def _trigger_specs_render(self):
+        cron = self.env.ref('icecat_product_enrichment.ir_cron_render_specifications', raise_if_not_found=False)
+        if cron:
+            cron._trigger()
+
+    @api.model
+    def cron_render_specifications(self):
+        """Background step: (re)render the specification HTML of outdated products"""
+        products = self.with_context(active_test=False).search([
+            ('icecat_specs_render_version', '!=', SPECS_RENDER_VERSION),
+            '|',
+            ('icecat_specifications_raw', '!=', False),
+            ('icecat_specifications_grouped', '!=', False),
+        ], limit=SPECS_RENDER_BATCH_SIZE + 1)
+        products[:SPECS_RENDER_BATCH_SIZE]._render_icecat_specifications()
+        if len(products) > SPECS_RENDER_BATCH_SIZE:
+            self._trigger_specs_render()
 
     def action_sync_with_icecat(self):
         """Manual sync action for selected products"""
         self.ensure_one()
         connector = self.env['icecat.connector']
         
-        # Get barcode from first variant that has one
-        barcode = self.product_variant_ids.filtered(lambda v: v.barcode)[:1].barcode
-        if not barcode:
-            raise UserError(_('Product must have a barcode (EAN/GTIN) to sync with Icecat.'))
+        if not self.icecat_gtin:
+            raise UserError(_('Product must have a valid barcode (EAN/GTIN) to sync with Icecat.'))
         
-        result = connector.sync_product(self, barcode)
+        result = connector.sync_product(self)
         
         if result.get('success'):
             return {
@@ -130,162 +254,62 @@ class ProductTemplate(models.Model):
         """Scheduled action to sync new products in small batches"""
         IceCatConnector = self.env['icecat.connector']
         
+        config = IceCatConnector._load_sync_config()
+        
         # Check if auto sync is enabled
-        if not self.env['ir.config_parameter'].sudo().get_param(
-            'icecat_product_enrichment.auto_sync_enabled', default=True
-        ):
+        if not config.auto_sync_enabled:
             return
         
-        batch_size = int(self.env['ir.config_parameter'].sudo().get_param(
-            'icecat_product_enrichment.new_product_batch_size', default=10
-        ))
+        batch_size = config.new_product_batch_size
         
         # Find products that have variants with barcodes but haven't been synced yet
         products = self.search([
-            ('product_variant_ids.barcode', '!=', False),
+            ('icecat_gtin', '!=', False),
             ('icecat_sync_status', 'in', ['not_synced', 'pending']),
+            ('icecat_sync_job_ids', 'not any', [('state', 'in', ['pending', 'running'])]),
         ], limit=batch_size, order='create_date desc')
         
-        if not products:
-            return
-        
-        # Create log entry
-        log = self.env['icecat.sync.log'].create({
-            'sync_type': 'new',
-            'total_products': len(products),
-            'status': 'running',
-        })
-        
-        synced_count = 0
-        error_count = 0
-        no_data_count = 0
-        
-        try:
-            for product in products:
-                try:
-                    # Get barcode from first variant that has one
-                    barcode = product.product_variant_ids.filtered(lambda v: v.barcode)[:1].barcode
-                    if not barcode:
-                        continue
-                    
-                    result = IceCatConnector.sync_product(product, barcode)
-                    if result.get('success'):
-                        synced_count += 1
-                    elif product.icecat_sync_status == 'no_data':
-                        no_data_count += 1
-                    else:
-                        error_count += 1
-                except Exception as e:
-                    error_count += 1
-                    product.write({
-                        'icecat_sync_status': 'error',
-                        'icecat_error_message': str(e),
-                    })
-            
-            # Update log
-            log.write({
-                'end_time': fields.Datetime.now(),
-                'synced_count': synced_count,
-                'error_count': error_count,
-                'no_data_count': no_data_count,
-                'status': 'completed',
-            })
-        except Exception as e:
-            log.write({
-                'end_time': fields.Datetime.now(),
-                'status': 'failed',
-                'error_message': str(e),
-            })
-            raise
-        
-        return {
-            'synced': synced_count,
-            'errors': error_count,
-            'no_data': no_data_count,
-            'total': len(products)
-        }
+        # Queue them and drain the queue until it is empty or the time budget is used
+        SyncJob = self.env['icecat.sync.job']
+        SyncJob._enqueue(products, priority=PRIORITY_NEW)
+        return SyncJob._process_queue(
+            'new', config=config,
+            cron_xmlid='icecat_product_enrichment.ir_cron_sync_new_products',
+        )
 
     @api.model
     def cron_update_products(self):
         """Scheduled action to update existing synced products (night run)"""
         IceCatConnector = self.env['icecat.connector']
         
-        # Check if auto sync is enabled
-        if not self.env['ir.config_parameter'].sudo().get_param(
-            'icecat_product_enrichment.auto_sync_enabled', default=True
-        ):
-            return
-        
-        batch_size = int(self.env['ir.config_parameter'].sudo().get_param(
-            'icecat_product_enrichment.update_batch_size', default=100
-        ))
-        
-        # Find products that were synced more than 30 days ago
-        thirty_days_ago = fields.Datetime.now() - fields.timedelta(days=30)
+        config = IceCatConnector._load_sync_config()
         
-        products = self.search([
-            ('product_variant_ids.barcode', '!=', False),
-            ('icecat_sync_status', '=', 'synced'),
-            '|',
-            ('icecat_last_sync', '<', thirty_days_ago),
-            ('icecat_last_sync', '=', False),
-        ], limit=batch_size, order='icecat_last_sync asc')
-        
-        if not products:
+        # Check if auto sync is enabled
+        if not config.auto_sync_enabled:
             return
         
-        # Create log entry
-        log = self.env['icecat.sync.log'].create({
-            'sync_type': 'update',
-            'total_products': len(products),
-            'status': 'running',
-        })
-        
-        synced_count = 0
-        error_count = 0
-        no_data_count = 0
+        batch_size = config.update_batch_size
         
-        try:
-            for product in products:
-                try:
-                    # Get barcode from first variant that has one
-                    barcode = product.product_variant_ids.filtered(lambda v: v.barcode)[:1].barcode
-                    if not barcode:
-                        continue
-                    
-                    result = IceCatConnector.sync_product(product, barcode)
-                    if result.get('success'):
-                        synced_count += 1
-                    elif product.icecat_sync_status == 'no_data':
-                        no_data_count += 1
-                    else:
-                        error_count += 1
-                except Exception as e:
-                    error_count += 1
-                    product.write({
-                        'icecat_sync_status': 'error',
-                        'icecat_error_message': str(e),
-                    })
+        if config.update_mode == 'index':
+            # Only products Icecat changed since their last sync (see icecat.catalog.index)
+            products = self.env['icecat.catalog.index']._get_updated_products(limit=batch_size)
+        else:
+            # Find products that were synced more than 30 days ago
+            thirty_days_ago = fields.Datetime.now() - fields.timedelta(days=30)
             
-            # Update log
-            log.write({
-                'end_time': fields.Datetime.now(),
-                'synced_count': synced_count,
-                'error_count': error_count,
-                'no_data_count': no_data_count,
-                'status': 'completed',
-            })
-        except Exception as e:
-            log.write({
-                'end_time': fields.Datetime.now(),
-                'status': 'failed',
-                'error_message': str(e),
-            })
-            raise
+            products = self.search([
+                ('icecat_gtin', '!=', False),
+                ('icecat_sync_status', '=', 'synced'),
+                ('icecat_sync_job_ids', 'not any', [('state', 'in', ['pending', 'running'])]),
+                '|',
+                ('icecat_last_sync', '<', thirty_days_ago),
+                ('icecat_last_sync', '=', False),
+            ], limit=batch_size, order='icecat_last_sync asc')
         
-        return {
-            'synced': synced_count,
-            'errors': error_count,
-            'no_data': no_data_count,
-            'total': len(products)
-        }
+        # Queue them and drain the queue until it is empty or the time budget is used
+        SyncJob = self.env['icecat.sync.job']
+        SyncJob._enqueue(products, priority=PRIORITY_UPDATE)
+        return SyncJob._process_queue(
+            'update', config=config,
+            cron_xmlid='icecat_product_enrichment.ir_cron_update_products',
+        )
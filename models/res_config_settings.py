@@ -2,6 +2,22 @@
 
 from odoo import fields, models
 
+IMAGE_SIZES = [
+    ('high', 'High (original)'),
+    ('medium', 'Medium (500x500)'),
+    ('low', 'Low'),
+    ('thumb', 'Thumbnail'),
+]
+
+# Numeric settings where 0 is a real choice (disabled / unlimited); Odoo deletes
+# a parameter saved as 0, which the connector would read back as the default
+ZERO_MEANINGFUL_FIELDS = (
+    'icecat_requests_per_second',
+    'icecat_max_retries',
+    'icecat_circuit_breaker_threshold',
+    'icecat_negative_cache_days',
+)
+
 
 class ResConfigSettings(models.TransientModel):
     _inherit = 'res.config.settings'
@@ -42,6 +58,76 @@ class ResConfigSettings(models.TransientModel):
         default=100,
         help='Number of products to update per batch (runs at night)'
     )
+    icecat_update_mode = fields.Selection([
+        ('age', 'Everything synced more than 30 days ago'),
+        ('index', 'Only products changed at Icecat (index files)'),
+    ], string='Update Mode',
+        config_parameter='icecat_product_enrichment.update_mode',
+        default='age',
+        help='How the nightly run picks the products to refresh'
+    )
+    icecat_index_source = fields.Char(
+        string='Index File',
+        config_parameter='icecat_product_enrichment.index_source',
+        help='Local path or URL of an Icecat index file (.xml or .xml.gz), '
+             'e.g. https://data.icecat.biz/export/freexml/EN/daily.index.xml.gz'
+    )
+    icecat_availability_check = fields.Boolean(
+        string='Check Catalog Availability',
+        config_parameter='icecat_product_enrichment.availability_check',
+        help='Mark unsynced products whose GTIN is not in the local copy of the Icecat product index '
+             'as "No Data" without calling the API; requires the Product Index File'
+    )
+    icecat_catalog_source = fields.Char(
+        string='Product Index File',
+        config_parameter='icecat_product_enrichment.catalog_source',
+        help='Local path or URL of the complete Icecat product index (.xml or .xml.gz), '
+             'e.g. https://data.icecat.biz/export/freexml/EN/files.index.xml.gz'
+    )
+    icecat_fetch_workers = fields.Integer(
+        string='Parallel Fetch Workers',
+        config_parameter='icecat_product_enrichment.fetch_workers',
+        default=4,
+        help='Number of Icecat requests (and image downloads) running in parallel during a batch sync'
+    )
+    icecat_requests_per_second = fields.Float(
+        string='Requests per Second',
+        config_parameter='icecat_product_enrichment.requests_per_second',
+        default=5.0,
+        help='Maximum Icecat API requests per second of one Odoo worker process (0 = unlimited). '
+             'The rate is lowered automatically when Icecat throttles.'
+    )
+    icecat_max_retries = fields.Integer(
+        string='Max Retries',
+        config_parameter='icecat_product_enrichment.max_retries',
+        default=3,
+        help='Retries for timeouts, connection errors, 429 and 5xx answers, with exponential backoff'
+    )
+    icecat_circuit_breaker_threshold = fields.Integer(
+        string='Circuit Breaker Threshold',
+        config_parameter='icecat_product_enrichment.circuit_breaker_threshold',
+        default=5,
+        help='Consecutive systemic failures (authentication, connection, timeout, throttling, 5xx) '
+             'after which a sync run stops. The next run probes Icecat first. 0 = disabled.'
+    )
+    icecat_negative_cache_days = fields.Integer(
+        string='Unknown GTIN Cache (days)',
+        config_parameter='icecat_product_enrichment.negative_cache_days',
+        default=30,
+        help='Days a GTIN that Icecat does not know (404 or brand restriction) is not requested again. 0 = disabled.'
+    )
+    icecat_job_lease_minutes = fields.Integer(
+        string='Sync Job Lease (minutes)',
+        config_parameter='icecat_product_enrichment.job_lease_minutes',
+        default=30,
+        help='Time a worker may hold a claimed sync job; afterwards another worker can take it over'
+    )
+    icecat_commit_chunk_size = fields.Integer(
+        string='Commit Chunk Size',
+        config_parameter='icecat_product_enrichment.commit_chunk_size',
+        default=20,
+        help='Number of GTINs a scheduled sync processes per committed chunk'
+    )
     icecat_auto_sync_enabled = fields.Boolean(
         string='Enable Auto Sync',
         config_parameter='icecat_product_enrichment.auto_sync_enabled',
@@ -57,6 +143,26 @@ class ResConfigSettings(models.TransientModel):
         config_parameter='icecat_product_enrichment.sync_images',
         help='Download and set product images from Icecat'
     )
+    icecat_main_image_size = fields.Selection(
+        IMAGE_SIZES,
+        string='Main Image Size',
+        config_parameter='icecat_product_enrichment.main_image_size',
+        default='high',
+        help='Icecat rendition downloaded for the main product image'
+    )
+    icecat_gallery_image_size = fields.Selection(
+        IMAGE_SIZES,
+        string='Extra Images Size',
+        config_parameter='icecat_product_enrichment.gallery_image_size',
+        default='high',
+        help='Icecat rendition downloaded for the extra product images'
+    )
+    icecat_image_max_kb = fields.Integer(
+        string='Max Image Size (KB)',
+        config_parameter='icecat_product_enrichment.image_max_kb',
+        default=20480,
+        help='Image downloads larger than this are aborted while streaming'
+    )
     icecat_sync_specifications = fields.Boolean(
         string='Sync Specifications to Description',
         config_parameter='icecat_product_enrichment.sync_specifications',
@@ -67,3 +173,14 @@ class ResConfigSettings(models.TransientModel):
         config_parameter='icecat_product_enrichment.sync_attributes',
         help='Create Odoo product attributes from Icecat specifications (can create many attributes!)'
     )
+
+    def set_values(self):
+        ICP = self.env['ir.config_parameter'].sudo()
+        old_catalog_type = ICP.get_param('icecat_product_enrichment.catalog_type') or 'open'
+        super().set_values()
+        for name in ZERO_MEANINGFUL_FIELDS:
+            if not self[name]:
+                ICP.set_param(self._fields[name].config_parameter, '0')
+        if old_catalog_type == 'open' and self.icecat_catalog_type == 'full':
+            # The full catalog knows GTINs the open one did not (brand restrictions)
+            self.env['icecat.negative.cache'].sudo()._invalidate_catalog('open')
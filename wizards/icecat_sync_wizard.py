@@ -3,6 +3,8 @@
 from odoo import api, fields, models, _
 from odoo.exceptions import UserError
 
+from ..models.icecat_sync_job import PRIORITY_MANUAL
+
 
 class IcecatSyncWizard(models.TransientModel):
     _name = 'icecat.sync.wizard'
@@ -35,22 +37,24 @@ class IcecatSyncWizard(models.TransientModel):
 
     def _get_product_domain(self):
         """Get domain based on sync type"""
+        # Products a cron worker is syncing right now are left to that worker
+        not_running = [('icecat_sync_job_ids', 'not any', [('state', '=', 'running')])]
         if self.sync_type == 'selected':
             product_ids = self.env.context.get('active_ids', [])
-            return [('id', 'in', product_ids), ('barcode', '!=', False)]
+            return [('id', 'in', product_ids), ('icecat_gtin', '!=', False)] + not_running
         elif self.sync_type == 'all_not_synced':
-            return [('barcode', '!=', False), ('icecat_sync_status', 'in', ['not_synced', 'pending'])]
+            return [('icecat_gtin', '!=', False), ('icecat_sync_status', 'in', ['not_synced', 'pending'])] + not_running
         elif self.sync_type == 'all_with_errors':
-            return [('barcode', '!=', False), ('icecat_sync_status', '=', 'error')]
+            return [('icecat_gtin', '!=', False), ('icecat_sync_status', '=', 'error')] + not_running
         elif self.sync_type == 'all_outdated':
             thirty_days_ago = fields.Datetime.now() - fields.timedelta(days=30)
             return [
-                ('barcode', '!=', False),
+                ('icecat_gtin', '!=', False),
                 ('icecat_sync_status', '=', 'synced'),
                 '|',
                 ('icecat_last_sync', '<', thirty_days_ago),
                 ('icecat_last_sync', '=', False),
-            ]
+            ] + not_running
         return []
 
     def action_sync_products(self):
@@ -64,34 +68,26 @@ class IcecatSyncWizard(models.TransientModel):
         if not products:
             raise UserError(_('No products found to synchronize.'))
         
-        # Perform sync
-        IceCatConnector = self.env['icecat.connector']
-        
-        synced_count = 0
-        error_count = 0
-        no_data_count = 0
-        
-        for product in products:
-            try:
-                result = IceCatConnector.sync_product(product)
-                if result.get('success'):
-                    synced_count += 1
-                elif product.icecat_sync_status == 'no_data':
-                    no_data_count += 1
-                else:
-                    error_count += 1
-            except Exception as e:
-                error_count += 1
-                product.write({
-                    'icecat_sync_status': 'error',
-                    'icecat_error_message': str(e),
-                })
+        # Queue with top priority and process exactly these jobs; GTINs a cron
+        # worker is fetching right now are not queued (see _enqueue), so they
+        # are never fetched twice
+        SyncJob = self.env['icecat.sync.job']
+        jobs = SyncJob._enqueue(products, priority=PRIORITY_MANUAL)
+        if not jobs:
+            raise UserError(_('These products are being synchronized by a scheduled run right now.'))
+        counts = SyncJob._process_queue('manual', len(jobs), job_ids=jobs.ids)
+        synced_count = counts.get('synced', 0)
+        error_count = counts.get('errors', 0)
+        no_data_count = counts.get('no_data', 0)
+        skipped_count = counts.get('skipped', 0)
         
         # Show result message
         message = _('Synchronization completed:\n')
         message += _('- Successfully synced: %s\n') % synced_count
         message += _('- No data available: %s\n') % no_data_count
         message += _('- Errors: %s') % error_count
+        if skipped_count:
+            message += _('\n- Skipped, Icecat unavailable: %s') % skipped_count
         
         return {
             'type': 'ir.actions.client',
@@ -99,7 +95,7 @@ class IcecatSyncWizard(models.TransientModel):
             'params': {
                 'title': _('Icecat Sync Completed'),
                 'message': message,
-                'type': 'success' if error_count == 0 else 'warning',
+                'type': 'success' if error_count == 0 and not skipped_count else 'warning',
                 'sticky': True,
             }
         }